@@ -0,0 +1,401 @@
+"""
+Extractor Benchmark
+===================
+Throughput benchmark of the extraction pipeline on synthetic data.
+
+The generator writes session CSVs shaped like the behavior-system exports
+(11-line header, Entry/Exit/Input/Reg/List rows, decimal-comma register
+values, a final Finish row) and catalogs pointing at them. Each stage is
+timed separately (best of --repeat runs):
+
+    parse      session bytes -> typed event table          events/s
+    segment    segment_trials on the parsed session         events/s
+    write      per-session output (--output-mode)           events/s
+    process    run_extraction over a synthetic catalog      files/s
+    aggregate  create_aggregated_file for the catalog       files/s
+
+Results can be saved as a baseline and later runs compared against it;
+the run fails (exit code 1) when a stage is slower than the baseline by
+more than --tolerance, or slower than a --min threshold. It also fails
+when a session written in --output-mode does not read back to the same
+tables (round-trip check).
+
+Usage:
+    python benchmark_extractor.py                                  # quick preset
+    python benchmark_extractor.py --preset full --save-baseline bench_baseline.json
+    python benchmark_extractor.py --baseline bench_baseline.json --tolerance 0.2
+    python benchmark_extractor.py --sizes 5000 2000000 --files 1000 --min parse=1e6
+
+Requirements:  pip install pandas numpy openpyxl
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from extraction_pipeline import (
+    OUTPUT_MODES, ExtractionConfig, MarkerSpec, create_aggregated_file, read_catalog,
+    read_session_output, run_extraction, write_session_output
+)
+from session_parser import parse_events, parse_header
+from trial_segmentation import segment_trials
+
+
+# Session sizes (events) and catalog shapes (files x events per file) per preset
+PRESETS = {
+    'quick': {'sizes': [5_000, 100_000], 'catalogs': [(20, 4_000)]},
+    'full': {'sizes': [5_000, 100_000, 1_000_000, 3_000_000], 'catalogs': [(100, 4_000), (2_000, 4_000)]},
+}
+
+STAGE_UNITS = {
+    'parse': 'events/s',
+    'segment': 'events/s',
+    'write': 'events/s',
+    'process': 'files/s',
+    'aggregate': 'files/s',
+}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Synthetic data
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _register(value: float) -> str:
+    """Register value as written by the behavior system: '   97,826'."""
+    whole, decimals = divmod(int(round(value * 1000)), 1000)
+    return f"{whole:5d},{decimals:03d}"
+
+
+def _trial_rows(rng: np.random.Generator, trial: int, correct: int) -> list[tuple]:
+    """(Cat, Num_cat, state, Display) rows of one synthetic trial."""
+    hole = int(rng.integers(1, 6))
+    rows = [
+        ('Entry', 1, 'MagEntry', ''),
+        ('Reg', 2, 'ComptNbessai', _register(trial)),
+        ('Reg', 13, 'Accuracy', _register(100 * correct / trial)),
+        ('Reg', 14, 'Omission', _register(0)),
+    ]
+    for _ in range(int(rng.integers(0, 4))):
+        lever = int(rng.integers(1, 5))
+        rows += [('Input', lever, f'On1A{lever}', ''), ('Input', lever + 32, f'Off1A{lever}', '')]
+    outcome = 'CorrectResp' if rng.random() < 0.7 else 'IncorrectResp'
+    rows += [
+        ('Exit', 1, 'MagEntry', '1'),
+        ('Entry', 2, 'ITI2sec', ''),
+        ('Exit', 2, 'ITI2sec', 'Time'),
+        ('Entry', 3, 'RandomHole', ''),
+        ('Exit', 3, 'RandomHole', 'Time'),
+        ('List', '', 'Pseudo1a5', _register(int(rng.integers(10, 20)))),
+        ('Entry', 10 + hole, f'hole{hole}', ''),
+        ('Reg', 12, 'HoleNumber', _register(hole)),
+        ('Exit', 10 + hole, f'hole{hole}', 'Time'),
+        ('Entry', 30, f'Hold{hole}', ''),
+        ('Exit', 30, f'Hold{hole}', '2'),
+        ('Entry', 18, outcome, ''),
+        ('Reg', 3 if outcome == 'CorrectResp' else 4,
+         'ComptCR' if outcome == 'CorrectResp' else 'ComptIncR', _register(correct)),
+        ('Exit', 18, outcome, 'Time'),
+    ]
+    return rows
+
+
+def synthetic_session(n_events: int, seed: int = 0, subject: int = 665) -> bytes:
+    """Bytes of a session CSV with about ``n_events`` event rows."""
+    rng = np.random.default_rng(seed)
+    lines = [
+        f",,Subject,,,{subject},", ",,Protocol,,,Level_4,", ",,Type,,,Master,",
+        ",,Channel,,,4,", ",,Master,,,,", ",,Date,,,2025-08-20,", ",,Time,,,16:43:58,241,",
+        ",,Clock,,,5,", ",,Time Warp,,,1x,", "0,0,000,Start,,,,", "1,0,000,Entry,0,Ready,,",
+    ]
+    num_line, time_ms, trial, correct = 2, 5, 0, 0
+    while num_line < n_events:
+        trial += 1
+        rows = _trial_rows(rng, trial, correct)
+        correct += any(state == 'CorrectResp' for _, _, state, _ in rows)
+        for cat, num_cat, state, display in rows:
+            lines.append(f"{num_line},{time_ms // 1000},{time_ms % 1000:03d},{cat},{num_cat},{state},{display},")
+            num_line += 1
+            time_ms += int(rng.integers(0, 3000))
+    lines.append(f"{num_line},{time_ms // 1000},{time_ms % 1000:03d},Exit,1,MagEntry,Time,")
+    lines.append(f"{num_line + 1},{time_ms // 1000},{time_ms % 1000:03d},Finish,,,,")
+    return ('\n'.join(lines) + '\n').encode('latin-1')
+
+
+def write_synthetic_catalog(root: str, n_files: int, events_per_file: int,
+                            exptype: str = 'TE', seed: int = 0) -> str:
+    """Catalog workbook (sheet 'data') plus its session CSVs in root/data."""
+    os.makedirs(os.path.join(root, 'data'), exist_ok=True)
+    names = []
+    for i in range(n_files):
+        name = f"session_{i:05d}"
+        with open(os.path.join(root, 'data', f"{name}.csv"), 'wb') as f:
+            f.write(synthetic_session(events_per_file, seed=seed + i, subject=600 + i % 100))
+        names.append(name)
+
+    catalog_path = os.path.join(root, 'Catalog.xlsx')
+    catalog_df = pd.DataFrame({
+        'Fichier': names,
+        'Animal': [600 + i % 100 for i in range(n_files)],
+        'Date': '2025-08-20',
+        'Box': [i % 4 + 1 for i in range(n_files)],
+        'Level': 'Level_4',
+        'Type': exptype,
+    })
+    catalog_df.to_excel(catalog_path, sheet_name='data', index=False)
+    return catalog_path
+
+
+def synthetic_config(catalog_path: str, output_mode: str) -> ExtractionConfig:
+    """Configuration matching the synthetic protocol."""
+    return ExtractionConfig(
+        catalog_path=catalog_path,
+        sheet_name='data',
+        filename_column='Fichier',
+        exptype_column='Type',
+        exptype='TE',
+        separator='MagEntry',
+        cat_value='Entry',
+        markers=[MarkerSpec('On1A2'), MarkerSpec('ITI2sec', 'RandomHole'),
+                 MarkerSpec('CorrectResp'), MarkerSpec('hole5')],
+        output_mode=output_mode,
+        parse_cache=False,
+    )
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Stages
+# ──────────────────────────────────────────────────────────────────────────────
+
+def best_time(func, repeat: int, setup=None) -> float:
+    """Shortest wall time of ``repeat`` calls (``setup`` runs untimed before each)."""
+    best = float('inf')
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_session(n_events: int, workdir: str, output_mode: str, repeat: int) -> dict:
+    """parse / segment / write throughput on one session of ``n_events`` events."""
+    data = synthetic_session(n_events)
+    df = parse_events(data)
+    header_lines = parse_header(data)
+    config = synthetic_config(os.path.join(workdir, 'Catalog.xlsx'), output_mode)
+    markers = config.marker_pairs()
+    trials_df = segment_trials(df, config.separator, config.cat_value, markers)
+
+    n = len(df)
+    timings = {
+        'parse': best_time(lambda: parse_events(data), repeat),
+        'segment': best_time(lambda: segment_trials(df, config.separator, config.cat_value, markers), repeat),
+        'write': best_time(lambda: write_session_output(config, workdir, f"bench_{n_events}.csv",
+                                                        df, trials_df, header_lines), repeat),
+    }
+    return {f"{stage}@{n_events}": {'seconds': seconds, 'throughput': n / seconds,
+                                     'unit': STAGE_UNITS[stage], 'count': n}
+            for stage, seconds in timings.items()}
+
+
+def bench_catalog(n_files: int, events_per_file: int, workdir: str, output_mode: str,
+                  repeat: int, workers: int) -> dict:
+    """process / aggregate throughput over a catalog of ``n_files`` sessions."""
+    root = os.path.join(workdir, f"catalog_{n_files}x{events_per_file}")
+    catalog_path = write_synthetic_catalog(root, n_files, events_per_file)
+    config = synthetic_config(catalog_path, output_mode)
+    catalog_df = read_catalog(config)
+    output_dir = os.path.join(root, 'processed_data')
+
+    # Every repeat starts from an empty output folder: outputs, fingerprint
+    # sidecars and manifest left by the previous one would let it skip the writes
+    process = best_time(lambda: run_extraction(config, catalog_df=catalog_df, output_dir=output_dir,
+                                               workers=workers, resume=False), repeat,
+                        setup=lambda: shutil.rmtree(output_dir, ignore_errors=True))
+    agg_data = pd.read_excel(run_extraction(config, catalog_df=catalog_df, output_dir=output_dir,
+                                            workers=workers, resume=False),
+                             sheet_name='aggregated_data').to_dict('records')
+    aggregate = best_time(lambda: create_aggregated_file(config, agg_data, output_dir), repeat)
+
+    key = f"{n_files}x{events_per_file}"
+    return {
+        f"process@{key}": {'seconds': process, 'throughput': n_files / process,
+                           'unit': 'files/s', 'count': n_files},
+        f"aggregate@{key}": {'seconds': aggregate, 'throughput': n_files / aggregate,
+                             'unit': 'files/s', 'count': n_files},
+    }
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Regression checks
+# ──────────────────────────────────────────────────────────────────────────────
+
+ROUND_TRIP_EVENTS = 5_000
+
+
+def _column_mismatch(expected: pd.Series, actual: pd.Series) -> bool:
+    """Whether a column read back differs from the one written (dtypes aside)."""
+    if len(expected) != len(actual):
+        return True
+    expected_numbers = pd.to_numeric(expected.astype(object), errors='coerce')
+    if expected_numbers.notna().sum() == expected.notna().sum():
+        actual_numbers = pd.to_numeric(actual.astype(object), errors='coerce')
+        return not np.allclose(expected_numbers.to_numpy(dtype=float), actual_numbers.to_numpy(dtype=float),
+                               equal_nan=True)
+    as_text = lambda column: column.astype(object).where(column.notna(), '').astype(str).to_numpy()
+    return not np.array_equal(as_text(expected), as_text(actual))
+
+
+def check_round_trip(workdir: str, output_mode: str) -> list[str]:
+    """Messages for every table of a written session that does not read back as written."""
+    data = synthetic_session(ROUND_TRIP_EVENTS)
+    df = parse_events(data)
+    header_lines = parse_header(data)
+    config = synthetic_config(os.path.join(workdir, 'Catalog.xlsx'), output_mode)
+    trials_df = segment_trials(df, config.separator, config.cat_value, config.marker_pairs())
+    filename = 'round_trip.csv'
+    write_session_output(config, workdir, filename, df, trials_df, header_lines)
+
+    expected = {'raw': df, 'trial': trials_df,
+                'header': pd.DataFrame({'Header': [line.strip() for line in header_lines]})}
+    if output_mode == 'xlsx_no_raw':
+        del expected['raw']
+    actual = read_session_output(config, workdir, filename)
+
+    failures = []
+    for name, table in expected.items():
+        if name not in actual:
+            failures.append(f"round trip ({output_mode}): table '{name}' missing")
+            continue
+        if list(actual[name].columns) != [str(c) for c in table.columns]:
+            failures.append(f"round trip ({output_mode}): columns of '{name}' differ")
+            continue
+        bad = [c for c in table.columns if _column_mismatch(table[c].reset_index(drop=True), actual[name][c])]
+        if bad:
+            failures.append(f"round trip ({output_mode}): '{name}' differs in {', '.join(map(str, bad))}")
+    return failures
+
+
+def find_regressions(results: dict, baseline: dict | None, tolerance: float,
+                     minimums: dict[str, float]) -> list[str]:
+    """Messages for every result slower than its baseline or minimum."""
+    failures = []
+    for key, result in results.items():
+        stage = key.split('@')[0]
+        if stage in minimums and result['throughput'] < minimums[stage]:
+            failures.append(f"{key}: {result['throughput']:,.0f} {result['unit']} "
+                            f"< minimum {minimums[stage]:,.0f}")
+        if baseline and key in baseline:
+            floor = baseline[key]['throughput'] * (1 - tolerance)
+            if result['throughput'] < floor:
+                failures.append(f"{key}: {result['throughput']:,.0f} {result['unit']} "
+                                f"< baseline {baseline[key]['throughput']:,.0f} - {tolerance:.0%}")
+    return failures
+
+
+def parse_minimums(items: list[str]) -> dict[str, float]:
+    minimums = {}
+    for item in items:
+        stage, _, value = item.partition('=')
+        if stage not in STAGE_UNITS or not value:
+            raise ValueError(f"Invalid --min '{item}' (expected STAGE=VALUE, STAGE in {', '.join(STAGE_UNITS)})")
+        minimums[stage] = float(value)
+    return minimums
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Command line
+# ──────────────────────────────────────────────────────────────────────────────
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark the CSV trial extraction pipeline.")
+    parser.add_argument('--preset', choices=list(PRESETS), default='quick',
+                        help="Sizes to run unless --sizes / --files are given (default: quick)")
+    parser.add_argument('--sizes', type=int, nargs='+', help="Session sizes in events")
+    parser.add_argument('--files', type=int, nargs='+', help="Catalog sizes in files")
+    parser.add_argument('--events-per-file', type=int, default=4_000,
+                        help="Events per session in the catalogs (default: 4000)")
+    parser.add_argument('--output-mode', choices=list(OUTPUT_MODES), default='xlsx_no_raw',
+                        help="Per-session output mode (default: xlsx_no_raw; the raw sheet "
+                             "cannot hold more than 1,048,576 events)")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes for the process stage")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage, the best is kept (default: 3)")
+    parser.add_argument('--workdir', help="Keep the synthetic data in this folder (default: temporary)")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Results JSON of a previous run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="Allowed slowdown against the baseline (default: 0.25 = 25%%)")
+    parser.add_argument('--min', action='append', default=[], metavar='STAGE=VALUE',
+                        help="Minimum throughput of a stage, e.g. parse=1e6 (repeatable)")
+    parser.add_argument('--save-baseline', help="Write the results as a new baseline JSON")
+    return parser
+
+
+def run_benchmarks(args, workdir: str) -> dict:
+    preset = PRESETS[args.preset]
+    sizes = args.sizes or preset['sizes']
+    catalogs = ([(n, args.events_per_file) for n in args.files] if args.files
+                else preset['catalogs'])
+
+    results = {}
+    for n_events in sizes:
+        print(f"Session of {n_events:,} events...", flush=True)
+        results.update(bench_session(n_events, workdir, args.output_mode, args.repeat))
+    for n_files, events_per_file in catalogs:
+        print(f"Catalog of {n_files:,} files x {events_per_file:,} events...", flush=True)
+        results.update(bench_catalog(n_files, events_per_file, workdir, args.output_mode,
+                                     args.repeat, args.workers))
+    return results
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        minimums = parse_minimums(args.min)
+        baseline = None
+        if args.baseline:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)['results']
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Invalid benchmark settings: {e}", file=sys.stderr)
+        return 2
+
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        results = run_benchmarks(args, args.workdir)
+        round_trip = check_round_trip(args.workdir, args.output_mode)
+    else:
+        with tempfile.TemporaryDirectory(prefix='extractor_bench_') as workdir:
+            results = run_benchmarks(args, workdir)
+            round_trip = check_round_trip(workdir, args.output_mode)
+
+    print()
+    print(f"{'stage':<28}{'seconds':>10}{'throughput':>16}  unit")
+    for key, result in results.items():
+        print(f"{key:<28}{result['seconds']:>10.3f}{result['throughput']:>16,.0f}  {result['unit']}")
+
+    report = {'output_mode': args.output_mode, 'workers': args.workers, 'results': results}
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+    failures = round_trip + find_regressions(results, baseline, args.tolerance, minimums)
+    if failures:
+        print("\nRegressions:", file=sys.stderr)
+        for failure in failures:
+            print(f"  {failure}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+CSV Batch Extractor
+===================
+Headless command-line runner for the CSV Trial Extractor pipeline.
+
+The configuration is the 'parameters' sheet written by a previous GUI run
+(the aggregated workbook itself can be passed), or a CSV file with the same
+Parameter/Value columns. Any setting can be overridden on the command line.
+Several configurations (extraction profiles, each bound to an experiment
+type) can be given at once: every CSV is then parsed once and each profile
+gets its own aggregated workbook.
+
+Usage:
+    python csv_batch_extractor.py --config processed_data/CMF_Catalogue_data_TE.xlsx
+    python csv_batch_extractor.py --config params.csv --catalog /srv/lab/CMF_Catalogue.xlsx --exptype TE
+    python csv_batch_extractor.py --config params.csv --workers 0
+    python csv_batch_extractor.py --config params.csv --statistics sum,count,median_time,p90_time
+    python csv_batch_extractor.py --config params.csv --markers all_holes_and_levers.csv
+    python csv_batch_extractor.py --config params.csv --registers Accuracy,Omission,ComptNbessai
+    python csv_batch_extractor.py --config params.csv --incremental --parquet-dataset
+    python csv_batch_extractor.py --config profile_TE.csv profile_PR.csv profile_EXT.csv
+
+Requirements:  pip install pandas numpy openpyxl
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import traceback
+
+from extraction_pipeline import (
+    OUTPUT_MODES, aggregated_file_path, load_config, load_markers, profile_path, read_catalog,
+    run_profiles, unresolved_files
+)
+from marker_statistics import STATISTICS
+from register_values import parse_registers
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Run the CSV trial extraction without a display.")
+    parser.add_argument('--config', required=True, nargs='+',
+                        help="Aggregated workbook (parameters sheet) or Parameter/Value CSV; "
+                             "several profiles are run in one pass")
+    parser.add_argument('--catalog', help="Catalog workbook (overrides the config)")
+    parser.add_argument('--sheet', help="Catalog sheet name")
+    parser.add_argument('--filename-column', help="Catalog column with the CSV filenames")
+    parser.add_argument('--exptype-column', help="Catalog column with the experiment types")
+    parser.add_argument('--exptype', help="Experiment type to process")
+    parser.add_argument('--separator', help="Trial separator state")
+    parser.add_argument('--cat-value', help="Cat value of the separator (Entry/Exit/Both)")
+    parser.add_argument('--incomplete-cat',
+                        help="Cat value marking a trial as incomplete (default: Finish; '' keeps every trial)")
+    parser.add_argument('--output-mode', choices=list(OUTPUT_MODES),
+                        help="Per-session output format: " + "; ".join(
+                            f"{mode} = {text}" for mode, text in OUTPUT_MODES.items()))
+    parser.add_argument('--markers', metavar='FILE',
+                        help="Marker list (CSV or workbook with Marker / Reward State columns) "
+                             "replacing the markers of the config")
+    parser.add_argument('--statistics',
+                        help="Comma-separated statistics per marker, e.g. sum,count,avg_time,median_time,"
+                             "p90_time (available: " + ", ".join(STATISTICS) + "; default: sum,avg_time)")
+    parser.add_argument('--bin-minutes', type=float,
+                        help="Also compute the statistics per time bin of N minutes (0 = no bins)")
+    parser.add_argument('--registers',
+                        help="Reg/List registers whose per-trial and last values are extracted: "
+                             "comma-separated names, or 'all' ('' = none)")
+    parser.add_argument('--parquet-dataset', action=argparse.BooleanOptionalAction,
+                        help="Also write the trial and session tables as a Parquet dataset "
+                             "partitioned by experiment type and animal (processed_data/dataset)")
+    parser.add_argument('--output-dir', help="Output folder (default: <catalog folder>/processed_data)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Parallel worker processes (0 = one per CPU core, default: 1)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only process sessions that are new or changed since the last run")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore the journal of an interrupted run and process every file again")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Always re-parse the CSV files instead of using the parse cache")
+    parser.add_argument('--cache-max-mb', type=float,
+                        help="Maximum size of the parse cache in MB")
+    parser.add_argument('--mmap-threshold-mb', type=float,
+                        help="Memory-map sessions of at least this size in MB instead of "
+                             "reading them into memory")
+    parser.add_argument('--prefetch-mb', type=float,
+                        help="Memory for reading the next session files ahead during a "
+                             "sequential run, in MB (0 disables read-ahead)")
+    parser.add_argument('--event-store', action='store_true',
+                        help="Also load every parsed session into the SQLite event store "
+                             "(processed_data/events.sqlite) for cross-session queries")
+    parser.add_argument('--profile', nargs='?', const='', metavar='PATH',
+                        help="Profile the run with cProfile and write the pstats dump to PATH "
+                             "(default: next to the aggregated file)")
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    configs = []
+    for config_path in args.config:
+        try:
+            configs.append(load_config(config_path))
+        except Exception as e:
+            print(f"Failed to read configuration {config_path}: {e}", file=sys.stderr)
+            return 2
+
+    markers = None
+    if args.markers:
+        try:
+            markers = load_markers(args.markers)
+        except Exception as e:
+            print(f"Failed to read marker list {args.markers}: {e}", file=sys.stderr)
+            return 2
+
+    overrides = {
+        'catalog_path': args.catalog,
+        'sheet_name': args.sheet,
+        'filename_column': args.filename_column,
+        'exptype_column': args.exptype_column,
+        'exptype': args.exptype,
+        'separator': args.separator,
+        'cat_value': args.cat_value,
+        'incomplete_cat': args.incomplete_cat,
+        'output_mode': args.output_mode,
+    }
+    for config in configs:
+        for attr, value in overrides.items():
+            if value is not None:
+                setattr(config, attr, value)
+        if markers is not None:
+            config.markers = list(markers)
+        if args.statistics is not None:
+            config.statistics = [name.strip() for name in args.statistics.split(',') if name.strip()]
+        if args.bin_minutes is not None:
+            config.bin_minutes = args.bin_minutes
+        if args.registers is not None:
+            config.registers = parse_registers(args.registers)
+        if args.parquet_dataset is not None:
+            config.parquet_dataset = args.parquet_dataset
+        if args.no_cache:
+            config.parse_cache = False
+        if args.cache_max_mb is not None:
+            config.cache_max_mb = args.cache_max_mb
+        if args.mmap_threshold_mb is not None:
+            config.mmap_threshold_mb = args.mmap_threshold_mb
+        if args.prefetch_mb is not None:
+            config.prefetch_mb = args.prefetch_mb
+        if args.event_store:
+            config.event_store = True
+
+    def show_progress(idx, total_files, filename):
+        print(f"Crunching {idx} out of {total_files}: {filename}", flush=True)
+
+    profile = args.profile
+    if profile == '':
+        profile = profile_path(aggregated_file_path(configs[0], args.output_dir or configs[0].output_dir))
+
+    try:
+        for config in configs:
+            config.validate()
+        catalog_df = read_catalog(configs[0])
+
+        # Report catalog files missing on disk before crunching anything
+        missing = unresolved_files(configs, catalog_df)
+        if missing:
+            print(f"{len(missing)} catalog file(s) not found, reported as 'not present':")
+            for filename in missing:
+                print(f"  {filename}")
+
+        workers = args.workers or os.cpu_count() or 1
+        agg_paths = run_profiles(configs, catalog_df=catalog_df, output_dir=args.output_dir,
+                                 progress=show_progress, workers=workers,
+                                 resume=not args.restart, incremental=args.incremental,
+                                 profile=profile)
+    except Exception as e:
+        print(f"Extraction failed: {e}", file=sys.stderr)
+        traceback.print_exc()
+        return 1
+
+    for agg_path in agg_paths:
+        print(f"Complete! Aggregated file: {agg_path}")
+    if profile:
+        print(f"Profile: {profile}  (python -m pstats {profile})")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+CSV Resolver
+============
+In-memory index of the session CSVs next to a catalog.
+
+The catalog names a session by file name; the CSV may sit in
+``<catalog folder>/data`` or in the catalog folder itself. Rather than
+checking both paths for every catalog row (one or two network round trips
+each on a mounted share), both folders are listed once with os.scandir and
+every lookup is answered from the listing.
+
+Lookup order for a catalog name:
+    1. exact name, in data/ then in the catalog folder
+    2. same name ignoring case
+    3. same name without its extension, ignoring case, among the .csv files
+       (``session_12`` or ``session_12.CSV`` finds ``Session_12.csv``)
+
+Requirements:  none (standard library)
+"""
+
+import os
+
+
+class CsvResolver:
+    """Index of the files in catalog_dir/data and catalog_dir."""
+
+    def __init__(self, catalog_dir: str):
+        self.catalog_dir = catalog_dir
+        self._exact = {}
+        self._folded = {}
+        self._stems = {}
+
+        # data/ first: its files win over same-named files in the catalog folder
+        for folder in (os.path.join(catalog_dir, 'data'), catalog_dir):
+            try:
+                entries = sorted((e for e in os.scandir(folder) if e.is_file()), key=lambda e: e.name)
+            except OSError:
+                continue
+            for entry in entries:
+                self._exact.setdefault(entry.name, entry.path)
+                self._folded.setdefault(entry.name.casefold(), entry.path)
+                stem, ext = os.path.splitext(entry.name)
+                if ext.lower() == '.csv':
+                    self._stems.setdefault(stem.casefold(), entry.path)
+
+    def resolve(self, filename: str) -> str | None:
+        """Path of a catalog file name, or None if it is in neither folder."""
+        path = self._exact.get(filename) or self._folded.get(filename.casefold())
+        if path is None:
+            # catalog_file_list appends '.csv', so 'x.CSV' arrives as 'x.CSV.csv'
+            stem = filename.casefold()
+            while stem.endswith('.csv'):
+                stem = stem[:-4]
+            path = self._stems.get(stem)
+        return path
+
+    def unresolved(self, filenames: list[str]) -> list[str]:
+        """Names that resolve to no file, in order and without duplicates."""
+        return [name for name in dict.fromkeys(filenames) if self.resolve(name) is None]
@@ -7,8 +7,23 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import pandas as pd
 import os
-from pathlib import Path
+import queue
+import threading
+import time
 import traceback
+import multiprocessing
+
+from extraction_pipeline import (
+    OUTPUT_MODES, ExtractionConfig, MarkerSpec, aggregated_file_path, catalog_file_list, load_config,
+    load_markers, profile_path, read_catalog, read_session_csv, resumable_files, run_extraction,
+    run_profiles, save_config, save_markers, unresolved_files, vocabulary_scan_path
+)
+from csv_resolver import CsvResolver
+from state_vocabulary import BatchVocabulary
+from trial_segmentation import DEFAULT_INCOMPLETE_CAT, trial_bounds
+from marker_statistics import DEFAULT_STATISTICS, STATISTICS, parse_statistics
+from register_values import parse_registers
+from vocabulary_scan import scan_vocabulary
 
 
 class CSVTrialExtractor:
@@ -22,12 +37,19 @@ class CSVTrialExtractor:
         self.catalog_df = None
         self.catalog_dir = None
         self.sheet_name = None
+        self.csv_resolver = None
         self.sample_csv_df = None
         self.trial_separator = None
         
-        # Marker storage (list of dicts)
+        # State/Cat names of every session seen for this catalog (feeds the dropdowns)
+        self.vocabulary = BatchVocabulary()
+        
+        # Markers to track (list of MarkerSpec, shown in the Tab 3 list)
         self.markers = []
         
+        # Set by the Cancel button while an extraction runs in the background
+        self.cancel_event = threading.Event()
+        
         self.create_gui()
     
     def create_gui(self):
@@ -61,6 +83,49 @@ class CSVTrialExtractor:
         self.execute_btn = ttk.Button(bottom_frame, text="Start Data Crunching", 
                                       command=self.execute_extraction, state='disabled')
         self.execute_btn.pack(side='right', padx=5)
+        
+        # Stops a running extraction after the files in progress
+        self.cancel_btn = ttk.Button(bottom_frame, text="Cancel", command=self.cancel_extraction,
+                                     state='disabled')
+        self.cancel_btn.pack(side='right', padx=5)
+        
+        # Opt-in parallel mode: files are crunched by a pool of worker processes
+        self.workers_var = tk.IntVar(value=1)
+        ttk.Spinbox(bottom_frame, from_=1, to=os.cpu_count() or 1, width=4,
+                    textvariable=self.workers_var, state='readonly').pack(side='right', padx=5)
+        ttk.Label(bottom_frame, text="Parallel workers:").pack(side='right')
+        
+        # Per-session output format (Excel, Excel without raw sheet, CSV, Parquet...)
+        self.output_mode_combo = ttk.Combobox(bottom_frame, state='readonly', width=45,
+                                              values=list(OUTPUT_MODES.values()))
+        self.output_mode_combo.current(0)
+        self.output_mode_combo.pack(side='right', padx=5)
+        ttk.Label(bottom_frame, text="Output:").pack(side='right')
+        
+        # Trial and session tables as one Parquet dataset (processed_data/dataset)
+        self.parquet_dataset_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(bottom_frame, text="Parquet dataset",
+                        variable=self.parquet_dataset_var).pack(side='right', padx=10)
+        
+        # Only crunch sessions that are new or changed since the last run
+        self.incremental_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(bottom_frame, text="Only new/changed sessions",
+                        variable=self.incremental_var).pack(side='right', padx=10)
+        
+        # Opt-in cProfile dump of the whole run, next to the aggregated file
+        self.profile_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(bottom_frame, text="Profile run",
+                        variable=self.profile_var).pack(side='right', padx=10)
+        
+        # Re-runs load already parsed CSVs from processed_data/.parse_cache
+        self.parse_cache_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(bottom_frame, text="Reuse parsed CSVs",
+                        variable=self.parse_cache_var).pack(side='right', padx=10)
+        
+        # Every parsed session also goes into processed_data/events.sqlite
+        self.event_store_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(bottom_frame, text="Event database",
+                        variable=self.event_store_var).pack(side='right', padx=10)
     
     def create_file_selection_tab(self, parent):
         """Create file selection and configuration UI"""
@@ -127,6 +192,8 @@ class CSVTrialExtractor:
         load_frame = ttk.Frame(parent, padding=10)
         load_frame.pack(fill='x', padx=10, pady=5)
         ttk.Button(load_frame, text="Load Sample CSV", command=self.load_sample_csv_manual).pack(side='left')
+        self.scan_btn = ttk.Button(load_frame, text="Scan All Sessions", command=self.scan_all_sessions)
+        self.scan_btn.pack(side='left', padx=5)
         self.sample_status_label = ttk.Label(load_frame, text="No sample loaded", foreground='gray')
         self.sample_status_label.pack(side='left', padx=10)
         
@@ -147,7 +214,12 @@ class CSVTrialExtractor:
         self.cat_combo = ttk.Combobox(sep_frame, state='readonly', width=30)
         self.cat_combo.grid(row=2, column=1, padx=5, pady=5)
         
-        ttk.Button(sep_frame, text="Find Trials", command=self.find_trials).grid(row=3, column=0, columnspan=2, pady=10)
+        ttk.Label(sep_frame, text="Exclude trials containing Cat:").grid(row=3, column=0, sticky='w', pady=5)
+        self.incomplete_cat_entry = ttk.Entry(sep_frame, width=32)
+        self.incomplete_cat_entry.insert(0, DEFAULT_INCOMPLETE_CAT)
+        self.incomplete_cat_entry.grid(row=3, column=1, sticky='w', padx=5, pady=5)
+        
+        ttk.Button(sep_frame, text="Find Trials", command=self.find_trials).grid(row=4, column=0, columnspan=2, pady=10)
         
         # Trial preview
         trial_frame = ttk.LabelFrame(parent, text="Trial Detection Results", padding=10)
@@ -157,72 +229,176 @@ class CSVTrialExtractor:
         self.trial_text.pack(fill='both', expand=True)
     
     def create_marker_config_tab(self, parent):
-        """Create marker configuration UI with scrollable canvas"""
+        """Create marker configuration UI: an editable marker list of any length"""
         # Instructions
         info_frame = ttk.Frame(parent)
         info_frame.pack(fill='x', padx=10, pady=5)
-        ttk.Label(info_frame, text="Configure up to 20 markers to track in trials. Leave unused markers unconfigured.", 
+        ttk.Label(info_frame, text="Markers to track in trials. Add them one by one or load a marker list file "
+                                   "(Marker / Reward State columns).",
                   font=('Arial', 9, 'italic')).pack()
         
-        # Create canvas with scrollbar
-        canvas_frame = ttk.Frame(parent)
-        canvas_frame.pack(fill='both', expand=True, padx=10, pady=5)
-        
-        canvas = tk.Canvas(canvas_frame, height=500)
-        scrollbar = ttk.Scrollbar(canvas_frame, orient="vertical", command=canvas.yview)
-        self.marker_frame = ttk.Frame(canvas)
-        
-        self.marker_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-        
-        canvas.create_window((0, 0), window=self.marker_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        canvas.pack(side="left", fill="both", expand=True)
+        # Editor: pick a state (and optional reward), then add or update the selected row
+        edit_frame = ttk.Frame(parent)
+        edit_frame.pack(fill='x', padx=10, pady=5)
+        ttk.Label(edit_frame, text="State:").pack(side='left')
+        self.marker_state_combo = ttk.Combobox(edit_frame, width=22)
+        self.marker_state_combo.pack(side='left', padx=5)
+        self.marker_reward_var = tk.BooleanVar()
+        ttk.Checkbutton(edit_frame, text="Reward?", variable=self.marker_reward_var,
+                        command=self.toggle_reward_combo).pack(side='left', padx=5)
+        self.marker_reward_combo = ttk.Combobox(edit_frame, width=22, state='disabled')
+        self.marker_reward_combo.pack(side='left', padx=5)
+        ttk.Button(edit_frame, text="Add", command=self.add_marker).pack(side='left', padx=2)
+        ttk.Button(edit_frame, text="Update", command=self.update_marker).pack(side='left', padx=2)
+        ttk.Button(edit_frame, text="Remove", command=self.remove_markers).pack(side='left', padx=2)
+        ttk.Button(edit_frame, text="Clear", command=self.clear_markers).pack(side='left', padx=2)
+        ttk.Button(edit_frame, text="Save List...", command=self.save_marker_list).pack(side='right', padx=2)
+        ttk.Button(edit_frame, text="Load List...", command=self.load_marker_list).pack(side='right', padx=2)
+        
+        # Marker list (the Treeview only draws the visible rows)
+        list_frame = ttk.Frame(parent)
+        list_frame.pack(fill='both', expand=True, padx=10, pady=5)
+        self.marker_tree = ttk.Treeview(list_frame, columns=('state', 'reward'), show='headings',
+                                        height=18, selectmode='extended')
+        self.marker_tree.heading('state', text='State')
+        self.marker_tree.heading('reward', text='Reward State')
+        self.marker_tree.column('state', width=250)
+        self.marker_tree.column('reward', width=250)
+        scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=self.marker_tree.yview)
+        self.marker_tree.configure(yscrollcommand=scrollbar.set)
+        self.marker_tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
-        
-        # Create 20 marker rows
-        headers = ['Marker', 'State', 'Reward?', 'Reward State']
-        for col, header in enumerate(headers):
-            ttk.Label(self.marker_frame, text=header, font=('Arial', 9, 'bold')).grid(
-                row=0, column=col, padx=5, pady=5, sticky='w')
-        
-        for i in range(20):
-            self.create_marker_row(i)
-    
-    def create_marker_row(self, index):
-        """Create a single marker configuration row"""
-        row = index + 1
-        
-        marker_dict = {
-            'label': ttk.Label(self.marker_frame, text=f"Marker {index + 1}"),
-            'state_combo': ttk.Combobox(self.marker_frame, state='readonly', width=20),
-            'reward_var': tk.BooleanVar(),
-            'reward_check': None,
-            'reward_combo': ttk.Combobox(self.marker_frame, state='disabled', width=20)
-        }
-        
-        marker_dict['label'].grid(row=row, column=0, padx=5, pady=2, sticky='w')
-        marker_dict['state_combo'].grid(row=row, column=1, padx=5, pady=2)
-        
-        marker_dict['reward_check'] = ttk.Checkbutton(
-            self.marker_frame, 
-            variable=marker_dict['reward_var'],
-            command=lambda idx=index: self.toggle_reward_combo(idx)
-        )
-        marker_dict['reward_check'].grid(row=row, column=2, padx=5, pady=2)
-        marker_dict['reward_combo'].grid(row=row, column=3, padx=5, pady=2)
-        
-        self.markers.append(marker_dict)
+        self.marker_tree.bind('<<TreeviewSelect>>', self.show_selected_marker)
+        
+        # Statistics computed for every marker and reward in the aggregated file
+        stats_frame = ttk.LabelFrame(parent, text="Aggregated Statistics", padding=10)
+        stats_frame.pack(fill='x', padx=10, pady=5)
+        ttk.Label(stats_frame, text="Statistics:").pack(side='left')
+        self.statistics_entry = ttk.Entry(stats_frame, width=45)
+        self.statistics_entry.insert(0, ", ".join(DEFAULT_STATISTICS))
+        self.statistics_entry.pack(side='left', padx=5)
+        ttk.Label(stats_frame, text="Available: " + ", ".join(STATISTICS) + " (e.g. p90_time)",
+                  font=('Arial', 9, 'italic')).pack(side='left', padx=5)
+        self.bin_minutes_entry = ttk.Entry(stats_frame, width=6)
+        self.bin_minutes_entry.insert(0, "0")
+        self.bin_minutes_entry.pack(side='right', padx=5)
+        ttk.Label(stats_frame, text="Time bins (min, 0 = off):").pack(side='right')
+        
+        # Reg/List registers copied per trial and as last value of the session
+        register_frame = ttk.LabelFrame(parent, text="Register Values", padding=10)
+        register_frame.pack(fill='x', padx=10, pady=5)
+        ttk.Label(register_frame, text="Registers:").pack(side='left')
+        self.registers_entry = ttk.Entry(register_frame, width=45)
+        self.registers_entry.pack(side='left', padx=5)
+        ttk.Label(register_frame, text="Comma-separated names (e.g. Accuracy, Omission), 'all' for every "
+                                       "Reg/List register, empty = none",
+                  font=('Arial', 9, 'italic')).pack(side='left', padx=5)
+        
+        # Extraction profiles: saved configurations, several run in one pass
+        profile_frame = ttk.LabelFrame(parent, text="Extraction Profiles", padding=10)
+        profile_frame.pack(fill='x', padx=10, pady=5)
+        ttk.Label(profile_frame, text="Save this configuration as a profile, or run several saved "
+                                      "profiles (one per experiment type) reading each CSV once.",
+                  font=('Arial', 9, 'italic')).pack(side='left')
+        self.run_profiles_btn = ttk.Button(profile_frame, text="Run Profiles...", command=self.run_saved_profiles)
+        self.run_profiles_btn.pack(side='right', padx=5)
+        ttk.Button(profile_frame, text="Save Profile...", command=self.save_profile).pack(side='right', padx=5)
     
-    def toggle_reward_combo(self, index):
+    def toggle_reward_combo(self):
         """Enable/disable reward combo based on checkbox"""
-        if self.markers[index]['reward_var'].get():
-            self.markers[index]['reward_combo']['state'] = 'readonly'
-        else:
-            self.markers[index]['reward_combo']['state'] = 'disabled'
+        self.marker_reward_combo['state'] = 'normal' if self.marker_reward_var.get() else 'disabled'
+    
+    def marker_from_editor(self):
+        """MarkerSpec of the editor fields, or None if no state is entered"""
+        state = self.marker_state_combo.get().strip()
+        if not state:
+            messagebox.showerror("Error", "Please select a marker state")
+            return None
+        reward_state = self.marker_reward_combo.get().strip() if self.marker_reward_var.get() else ''
+        return MarkerSpec(state, reward_state or None)
+    
+    def refresh_marker_list(self):
+        """Redraw the marker list from self.markers"""
+        self.marker_tree.delete(*self.marker_tree.get_children())
+        for index, marker in enumerate(self.markers):
+            self.marker_tree.insert('', 'end', iid=str(index), values=(marker.state, marker.reward_state or ''))
+    
+    def selected_marker_indices(self):
+        return sorted(int(iid) for iid in self.marker_tree.selection())
+    
+    def show_selected_marker(self, event=None):
+        """Load the selected marker into the editor fields"""
+        selected = self.selected_marker_indices()
+        if len(selected) != 1:
+            return
+        marker = self.markers[selected[0]]
+        self.marker_state_combo.set(marker.state)
+        self.marker_reward_var.set(bool(marker.reward_state))
+        self.toggle_reward_combo()
+        self.marker_reward_combo.set(marker.reward_state or '')
+    
+    def add_marker(self):
+        marker = self.marker_from_editor()
+        if marker is not None:
+            self.markers.append(marker)
+            self.refresh_marker_list()
+            self.marker_tree.see(str(len(self.markers) - 1))
+    
+    def update_marker(self):
+        selected = self.selected_marker_indices()
+        if len(selected) != 1:
+            messagebox.showerror("Error", "Please select one marker to update")
+            return
+        marker = self.marker_from_editor()
+        if marker is not None:
+            self.markers[selected[0]] = marker
+            self.refresh_marker_list()
+    
+    def remove_markers(self):
+        selected = set(self.selected_marker_indices())
+        self.markers = [m for i, m in enumerate(self.markers) if i not in selected]
+        self.refresh_marker_list()
+    
+    def clear_markers(self):
+        if self.markers and messagebox.askyesno("Clear markers", f"Remove all {len(self.markers)} markers?"):
+            self.markers = []
+            self.refresh_marker_list()
+    
+    def load_marker_list(self):
+        """Replace the markers with those of a marker list file (or of a profile)"""
+        filepath = filedialog.askopenfilename(
+            title="Load Marker List",
+            initialdir=self.catalog_dir,
+            filetypes=[("Marker lists", "*.csv *.xlsx"), ("All files", "*.*")]
+        )
+        if not filepath:
+            return
+        try:
+            self.markers = load_markers(filepath)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load marker list:\n{str(e)}")
+            return
+        self.refresh_marker_list()
+        self.progress_label.config(text=f"Loaded {len(self.markers)} markers from {os.path.basename(filepath)}")
+    
+    def save_marker_list(self):
+        if not self.markers:
+            messagebox.showerror("Error", "No markers to save")
+            return
+        filepath = filedialog.asksaveasfilename(
+            title="Save Marker List",
+            initialdir=self.catalog_dir,
+            initialfile="markers.csv",
+            defaultextension=".csv",
+            filetypes=[("Marker lists", "*.csv"), ("All files", "*.*")]
+        )
+        if not filepath:
+            return
+        try:
+            save_markers(self.markers, filepath)
+            self.progress_label.config(text=f"Marker list saved: {os.path.basename(filepath)}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save marker list:\n{str(e)}")
     
     def browse_catalog(self):
         """Browse for catalog Excel file"""
@@ -249,6 +425,8 @@ class CSVTrialExtractor:
             
             self.sheet_name = sheet_name
             self.catalog_df = pd.read_excel(self.catalog_path, sheet_name=sheet_name, engine='openpyxl')
+            self.csv_resolver = CsvResolver(self.catalog_dir)
+            self.vocabulary = BatchVocabulary()
             
             # Populate column dropdowns
             columns = list(self.catalog_df.columns)
@@ -313,18 +491,9 @@ class CSVTrialExtractor:
                 self.browse_csv_btn['state'] = 'disabled'
                 return
             
-            # Filter by experiment type
-            filtered_df = self.catalog_df[self.catalog_df[exptype_col] == exp_filter]
-            
-            # Get first CSV filename from filtered catalog
-            suggested_file = None
-            for idx, row in filtered_df.iterrows():
-                fname = str(row[filename_col]).strip()
-                if fname and fname.lower() != 'nan':
-                    if not fname.endswith('.csv'):
-                        fname = fname + '.csv'
-                    suggested_file = fname
-                    break
+            # First CSV filename of the selected experiment type
+            file_list = catalog_file_list(self.catalog_df, filename_col, exptype_col, exp_filter)
+            suggested_file = file_list[0] if file_list else None
             
             if not suggested_file:
                 self.suggested_csv_label.config(text="No CSV files found for this experiment type", foreground='red')
@@ -332,11 +501,9 @@ class CSVTrialExtractor:
                 return
             
             # Check if the suggested file exists
-            csv_path = os.path.join(self.catalog_dir, 'data', suggested_file)
-            if not os.path.exists(csv_path):
-                csv_path = os.path.join(self.catalog_dir, suggested_file)
+            csv_path = self.csv_resolver.resolve(suggested_file)
             
-            if os.path.exists(csv_path):
+            if csv_path:
                 self.suggested_csv_label.config(text=suggested_file, foreground='green')
                 self.browse_csv_btn['state'] = 'disabled'
             else:
@@ -359,14 +526,7 @@ class CSVTrialExtractor:
         if filepath:
             try:
                 # Load the selected CSV file
-                df = pd.read_csv(
-                    filepath,
-                    skiprows=11,
-                    usecols=range(8),
-                    encoding='latin-1',
-                    header=None,
-                    names=['Num_line', 'S', 'MS', 'Cat', 'Num_cat', 'state', 'Display', 'null']
-                )
+                df = read_session_csv(filepath)
                 
                 self.sample_csv_df = df
                 
@@ -377,13 +537,8 @@ class CSVTrialExtractor:
                 self.browse_csv_btn['state'] = 'disabled'
                 
                 # Populate dropdowns
-                unique_states = sorted(df['state'].dropna().unique().tolist())
-                self.trial_sep_combo['values'] = unique_states
-                
-                # Populate marker state dropdowns
-                for marker in self.markers:
-                    marker['state_combo']['values'] = unique_states
-                    marker['reward_combo']['values'] = unique_states
+                self.vocabulary.add_session(df)
+                self.update_state_dropdowns()
                 
                 messagebox.showinfo("Success", f"CSV file loaded successfully!\\n{len(df)} rows found.")
                 
@@ -392,6 +547,10 @@ class CSVTrialExtractor:
         
     def load_sample_csv_manual(self):
         """Manual trigger to load sample CSV"""
+        # Pick up CSV files added since the catalog was loaded
+        if self.catalog_dir:
+            self.csv_resolver = CsvResolver(self.catalog_dir)
+        
         # Update the suggested CSV display first
         self.update_suggested_csv()
         
@@ -416,21 +575,9 @@ class CSVTrialExtractor:
             exptype_col = self.exptype_col_combo.get()
             exp_filter = self.exptype_filter_combo.get()
             
-            # Filter by experiment type if both column and filter are selected
-            if exptype_col and exp_filter:
-                filtered_df = self.catalog_df[self.catalog_df[exptype_col] == exp_filter]
-            else:
-                filtered_df = self.catalog_df
-            
-            # Get first CSV filename from filtered catalog
-            first_file = None
-            for idx, row in filtered_df.iterrows():
-                fname = str(row[filename_col]).strip()
-                if fname and fname.lower() != 'nan':
-                    if not fname.endswith('.csv'):
-                        fname = fname + '.csv'
-                    first_file = fname
-                    break
+            # First CSV filename, filtered by experiment type if both column and filter are selected
+            file_list = catalog_file_list(self.catalog_df, filename_col, exptype_col, exp_filter)
+            first_file = file_list[0] if file_list else None
             
             if not first_file:
                 messagebox.showerror("Error", "No valid CSV filenames found in catalog")
@@ -439,11 +586,9 @@ class CSVTrialExtractor:
                 return None
             
             # Try to load the CSV file
-            csv_path = os.path.join(self.catalog_dir, 'data', first_file)
-            if not os.path.exists(csv_path):
-                csv_path = os.path.join(self.catalog_dir, first_file)
+            csv_path = self.csv_resolver.resolve(first_file)
             
-            if not os.path.exists(csv_path):
+            if csv_path is None:
                 if hasattr(self, 'sample_status_label'):
                     self.sample_status_label.config(text=f"CSV not found: {first_file}", foreground='red')
                 if hasattr(self, 'browse_csv_btn'):
@@ -453,28 +598,17 @@ class CSVTrialExtractor:
                 return None
             
             # Load CSV with proper encoding and structure
-            df = pd.read_csv(
-                csv_path,
-                skiprows=11,
-                usecols=range(8),
-                encoding='latin-1',
-                header=None,
-                names=['Num_line', 'S', 'MS', 'Cat', 'Num_cat', 'state', 'Display', 'null']
-            )
+            df = read_session_csv(csv_path)
             
             self.sample_csv_df = df
             
-            # Populate trial separator dropdown with unique 'state' values
-            unique_states = sorted(df['state'].dropna().unique().tolist())
-            self.trial_sep_combo['values'] = unique_states
+            # Populate trial separator and marker dropdowns from the state vocabulary
+            self.vocabulary.add_session(df)
+            self.update_state_dropdowns()
             
-            # Also get unique Cat values (Entry, Exit, etc.)
-            unique_cats = sorted(df['Cat'].dropna().unique().tolist())
-            
-            # Populate marker state dropdowns
-            for marker in self.markers:
-                marker['state_combo']['values'] = unique_states
-                marker['reward_combo']['values'] = unique_states
+            # Also get unique state and Cat values (Entry, Exit, etc.) of this sample
+            unique_states = df['state'].dropna().unique()
+            unique_cats = df['Cat'].dropna().unique()
             
             if hasattr(self, 'sample_status_label'):
                 self.sample_status_label.config(
@@ -496,6 +630,64 @@ class CSVTrialExtractor:
             messagebox.showerror("Error", f"Failed to load sample CSV:\\n{str(e)}\\n\\n{traceback.format_exc()}")
             return None
     
+    def scan_all_sessions(self):
+        """Collect the states of every session of the experiment type (Cat/state columns only)"""
+        if self.catalog_df is None:
+            messagebox.showerror("Error", "Please load catalog sheet first")
+            return
+        
+        file_list = catalog_file_list(self.catalog_df, self.filename_col_combo.get(),
+                                      self.exptype_col_combo.get(), self.exptype_filter_combo.get())
+        self.csv_resolver = CsvResolver(self.catalog_dir)
+        csv_paths = [path for path in map(self.csv_resolver.resolve, file_list) if path]
+        if not csv_paths:
+            messagebox.showerror("Error", "No CSV files found for this experiment type")
+            return
+        
+        cache_path = vocabulary_scan_path(os.path.join(self.catalog_dir, 'processed_data'))
+        workers = self.workers_var.get()
+        self.sample_status_label.config(text=f"Scanning {len(csv_paths)} sessions...", foreground='gray')
+        self.run_in_background(
+            lambda progress, cancel: scan_vocabulary(csv_paths, cache_path, workers, progress, cancel),
+            self.scan_done)
+    
+    def scan_done(self, outcome):
+        """Feed the dropdowns from a finished vocabulary scan and list the state counts"""
+        if 'error' in outcome:
+            messagebox.showerror("Error", f"Scan failed:\n{str(outcome['error'])}\n\n{outcome['traceback']}")
+            self.sample_status_label.config(text="Scan failed", foreground='red')
+            self.progress_label.config(text="Ready")
+            return
+        
+        scan = outcome['result']
+        scan.add_to(self.vocabulary)
+        self.update_state_dropdowns()
+        
+        self.sample_status_label.config(
+            text=f"Scanned {scan.sessions} sessions ({scan.read} read, {scan.sessions - scan.read} cached): "
+                 f"{len(scan.state_events)} states, {len(scan.cat_events)} categories",
+            foreground='green')
+        self.progress_label.config(text="Ready")
+        
+        # State occurrences across the scanned sessions
+        lines = [f"States used by {scan.sessions} sessions:\n",
+                 f"{'State':<30}{'Events':>10}{'Sessions':>10}"]
+        for name in sorted(scan.state_events):
+            lines.append(f"{name:<30}{scan.state_events[name]:>10}{scan.state_sessions[name]:>10}")
+        lines.append("\nCat values: " + ", ".join(f"{name} ({count})" for name, count in sorted(scan.cat_events.items())))
+        if scan.failed:
+            lines.append(f"\nCould not read {len(scan.failed)} file(s):")
+            lines.extend(f"  {os.path.basename(path)}: {error}" for path, error in scan.failed.items())
+        self.trial_text.delete('1.0', tk.END)
+        self.trial_text.insert('1.0', "\n".join(lines))
+    
+    def update_state_dropdowns(self):
+        """Feed the separator and marker dropdowns from the state vocabulary"""
+        states = self.vocabulary.state.names()
+        self.trial_sep_combo['values'] = states
+        self.marker_state_combo['values'] = states
+        self.marker_reward_combo['values'] = states
+    
     def update_numcat_values(self, event=None):
         """Update Num_cat values display based on selected separator"""
         if self.sample_csv_df is None:
@@ -551,33 +743,16 @@ class CSVTrialExtractor:
         try:
             df = self.sample_csv_df
             
-            # Find trial start positions
-            # state == separator (column F) AND Cat == selected value (column D)
-            if cat_value == "Both":
-                # If "Both" selected, find all rows with the separator regardless of Cat
-                trial_starts = df[df['state'] == separator].index.tolist()
-            else:
-                # Find rows where state == separator AND Cat == selected value (Entry or Exit)
-                trial_starts = df[(df['state'] == separator) & (df['Cat'] == cat_value)].index.tolist()
-            
-            # Exclude trials that contain 'Finish' in Cat column
-            valid_trials = []
-            for i, start_idx in enumerate(trial_starts):
-                # Determine trial end
-                if i < len(trial_starts) - 1:
-                    end_idx = trial_starts[i + 1]
-                else:
-                    end_idx = len(df)
-                
-                # Check if this trial contains 'Finish'
-                trial_segment = df.iloc[start_idx:end_idx]
-                if 'Finish' not in trial_segment['Cat'].values:
-                    valid_trials.append((start_idx, end_idx))
+            # Trial starts: state == separator (column F) AND Cat == selected value (column D),
+            # any Cat if "Both". Trials containing the incomplete-trial Cat are excluded.
+            incomplete_cat = self.incomplete_cat_entry.get().strip()
+            starts, ends, complete = trial_bounds(df, separator, cat_value, incomplete_cat, self.vocabulary)
+            valid_trials = list(zip(starts[complete].tolist(), ends[complete].tolist()))
             
             # Display results
             result = f"Trial Separator: {separator}\n"
             result += f"Cat Value: {cat_value}\n"
-            result += f"Total trial markers found: {len(trial_starts)}\n"
+            result += f"Total trial markers found: {len(starts)}\n"
             result += f"Valid trials (excluding incomplete): {len(valid_trials)}\n\n"
             result += "First 5 valid trials:\n"
             
@@ -602,51 +777,221 @@ class CSVTrialExtractor:
             if not self.validate_config():
                 return
             
-            # Get file list from catalog
-            filename_col = self.filename_col_combo.get()
-            exptype_col = self.exptype_col_combo.get()
-            exp_filter = self.exptype_filter_combo.get()
-            
-            # Filter files by experiment type
-            filtered_df = self.catalog_df[self.catalog_df[exptype_col] == exp_filter]
-            file_list = []
-            for idx, row in filtered_df.iterrows():
-                fname = str(row[filename_col]).strip()
-                if fname and fname.lower() != 'nan':
-                    if not fname.endswith('.csv'):
-                        fname = fname + '.csv'
-                    file_list.append(fname)
-            
-            if not file_list:
+            config = self.build_config()
+            total_files = len(catalog_file_list(self.catalog_df, config.filename_column,
+                                                config.exptype_column, config.exptype))
+            if not total_files:
                 messagebox.showerror("Error", "No files found matching the selected experiment type")
                 return
             
-            # Create output directory
-            output_dir = os.path.join(self.catalog_dir, 'processed_data')
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Prepare aggregation data
-            agg_data = []
-            
-            # Process each file
-            total_files = len(file_list)
-            for idx, filename in enumerate(file_list, 1):
-                self.progress_label.config(text=f"Crunching {idx} out of {total_files}")
-                self.root.update()
-                
-                result = self.process_file(filename, output_dir)
-                agg_data.append(result)
-            
-            # Create aggregated file
-            self.create_aggregated_file(agg_data, output_dir, exp_filter)
+            if not self.confirm_unresolved([config], self.catalog_df):
+                return
             
-            self.progress_label.config(text=f"Complete! Processed {total_files} files.")
-            messagebox.showinfo("Success", f"Data extraction complete!\n\nProcessed {total_files} files.\nOutput location: {output_dir}")
+            # Offer to continue an interrupted run with the same configuration
+            resume = True
+            already_done = resumable_files(config)
+            if already_done:
+                resume = messagebox.askyesno(
+                    "Resume previous run",
+                    f"An interrupted run with the same configuration already processed "
+                    f"{already_done} of {total_files} files.\n\n"
+                    "Yes: resume and skip those files\nNo: process every file again")
+            
+            workers = self.workers_var.get()
+            incremental = self.incremental_var.get()
+            profile = None
+            if self.profile_var.get():
+                profile = profile_path(aggregated_file_path(config, config.output_dir))
+            # The worker thread gets its own vocabulary: the Tk thread keeps adding to self.vocabulary
+            run_vocabulary = BatchVocabulary()
+            self.run_in_background(
+                lambda progress, cancel: run_extraction(config, catalog_df=self.catalog_df, progress=progress,
+                                                        workers=workers, resume=resume,
+                                                        incremental=incremental, vocabulary=run_vocabulary,
+                                                        profile=profile, cancel=cancel),
+                lambda outcome: self.extraction_done(outcome, config, total_files, run_vocabulary))
             
         except Exception as e:
             messagebox.showerror("Error", f"Extraction failed:\n{str(e)}\n\n{traceback.format_exc()}")
             self.progress_label.config(text="Error occurred")
     
+    def extraction_done(self, outcome, config, total_files, run_vocabulary):
+        """Report the end of a single-profile extraction"""
+        # The run collected the states of every session it processed
+        self.vocabulary.merge(run_vocabulary)
+        self.update_state_dropdowns()
+        if 'error' in outcome:
+            messagebox.showerror("Error", f"Extraction failed:\n{str(outcome['error'])}\n\n{outcome['traceback']}")
+            self.progress_label.config(text="Error occurred")
+            return
+        
+        if outcome['result'] == aggregated_file_path(config, config.output_dir, partial=True):
+            self.show_cancelled([outcome['result']])
+            return
+        self.progress_label.config(text=f"Complete! Processed {total_files} files.")
+        messagebox.showinfo("Success", f"Data extraction complete!\n\nProcessed {total_files} files.\nOutput location: {config.output_dir}")
+    
+    def show_cancelled(self, agg_paths):
+        """Report a cancelled run and the partial workbook(s) it wrote"""
+        agg_names = "\n".join(os.path.basename(path) for path in agg_paths)
+        self.progress_label.config(text="Cancelled - partial results written")
+        messagebox.showinfo("Cancelled",
+                            f"Extraction cancelled.\n\nPartial aggregated file(s):\n{agg_names}\n\n"
+                            "Starting the same run again resumes where it stopped.")
+    
+    def run_in_background(self, job, on_done):
+        """Run job(progress, cancel) on a background thread; the window stays responsive.
+        
+        Progress comes back through a queue polled with root.after. When the
+        job ends, on_done(outcome) is called on the Tk thread with a dict
+        holding 'result', or 'error' and 'traceback'.
+        """
+        progress_queue = queue.Queue()
+        outcome = {}
+        self.cancel_event = threading.Event()
+        
+        def show_progress(idx, total_files, filename):
+            progress_queue.put((idx, total_files, time.perf_counter()))
+        
+        def run():
+            try:
+                outcome['result'] = job(show_progress, self.cancel_event)
+            except Exception as e:
+                outcome['error'] = e
+                outcome['traceback'] = traceback.format_exc()
+        
+        first_report = []
+        
+        def poll():
+            latest = None
+            try:
+                while True:
+                    latest = progress_queue.get_nowait()
+            except queue.Empty:
+                pass
+            if latest is not None and not self.cancel_event.is_set():
+                if not first_report:
+                    first_report.append(latest)
+                self.progress_label.config(text=progress_text(first_report[0], latest))
+            if worker.is_alive():
+                self.root.after(100, poll)
+                return
+            for button in (self.execute_btn, self.run_profiles_btn, self.scan_btn):
+                button['state'] = 'normal'
+            self.cancel_btn['state'] = 'disabled'
+            on_done(outcome)
+        
+        worker = threading.Thread(target=run, daemon=True)
+        # One job at a time: a second one would replace cancel_event and re-enable these on its own end
+        for button in (self.execute_btn, self.run_profiles_btn, self.scan_btn):
+            button['state'] = 'disabled'
+        self.cancel_btn['state'] = 'normal'
+        worker.start()
+        self.root.after(100, poll)
+    
+    def cancel_extraction(self):
+        """Stop the running extraction once the files in progress are done"""
+        self.cancel_event.set()
+        self.cancel_btn['state'] = 'disabled'
+        self.progress_label.config(text="Cancelling after the current file...")
+    
+    def confirm_unresolved(self, configs, catalog_df):
+        """Report catalog files missing on disk up front; True to go ahead"""
+        missing = unresolved_files(configs, catalog_df)
+        if not missing:
+            return True
+        listed = "\n".join(missing[:15])
+        if len(missing) > 15:
+            listed += f"\n... and {len(missing) - 15} more"
+        return messagebox.askyesno(
+            "Missing CSV files",
+            f"{len(missing)} catalog file(s) were not found in the data folder or next to the "
+            f"catalog:\n\n{listed}\n\nThey will be reported as 'not present'. Continue?")
+    
+    def save_profile(self):
+        """Save the current configuration as an extraction profile"""
+        if not self.validate_config():
+            return
+        config = self.build_config()
+        filepath = filedialog.asksaveasfilename(
+            title="Save Extraction Profile",
+            initialdir=self.catalog_dir,
+            initialfile=f"profile_{config.exptype}.csv",
+            defaultextension=".csv",
+            filetypes=[("Profile files", "*.csv"), ("All files", "*.*")]
+        )
+        if not filepath:
+            return
+        try:
+            save_config(config, filepath)
+            self.progress_label.config(text=f"Profile saved: {os.path.basename(filepath)}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save profile:\n{str(e)}")
+    
+    def run_saved_profiles(self):
+        """Run several saved profiles in one pass over the catalog"""
+        filepaths = filedialog.askopenfilenames(
+            title="Select Extraction Profiles",
+            initialdir=self.catalog_dir,
+            filetypes=[("Profile files", "*.csv *.xlsx"), ("All files", "*.*")]
+        )
+        if not filepaths:
+            return
+        try:
+            configs = [load_config(filepath) for filepath in filepaths]
+            for config in configs:
+                config.parse_cache = self.parse_cache_var.get()
+                config.event_store = self.event_store_var.get()
+            catalog_df = read_catalog(configs[0])
+            if not self.confirm_unresolved(configs, catalog_df):
+                return
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to read profiles:\n{str(e)}")
+            return
+        
+        workers = self.workers_var.get()
+        incremental = self.incremental_var.get()
+        self.run_in_background(
+            lambda progress, cancel: run_profiles(configs, catalog_df=catalog_df, progress=progress,
+                                                  workers=workers, incremental=incremental, cancel=cancel),
+            lambda outcome: self.profiles_done(outcome, configs))
+    
+    def profiles_done(self, outcome, configs):
+        """Report the end of a multi-profile run"""
+        if 'error' in outcome:
+            messagebox.showerror("Error", f"Extraction failed:\n{str(outcome['error'])}\n\n{outcome['traceback']}")
+            self.progress_label.config(text="Error occurred")
+            return
+        if outcome['result'] != [aggregated_file_path(config, config.output_dir) for config in configs]:
+            self.show_cancelled(outcome['result'])
+            return
+        
+        agg_names = "\n".join(os.path.basename(path) for path in outcome['result'])
+        self.progress_label.config(text=f"Complete! Ran {len(configs)} profiles.")
+        messagebox.showinfo("Success", f"Data extraction complete!\n\nAggregated files:\n{agg_names}\n"
+                                       f"Output location: {configs[0].output_dir}")
+    
+    def build_config(self):
+        """Collect the current GUI settings into an ExtractionConfig"""
+        return ExtractionConfig(
+            catalog_path=self.catalog_path,
+            sheet_name=self.sheet_name,
+            filename_column=self.filename_col_combo.get(),
+            exptype_column=self.exptype_col_combo.get(),
+            exptype=self.exptype_filter_combo.get(),
+            separator=self.trial_sep_combo.get(),
+            cat_value=self.cat_combo.get(),
+            incomplete_cat=self.incomplete_cat_entry.get().strip(),
+            markers=list(self.markers),
+            output_mode=list(OUTPUT_MODES)[self.output_mode_combo.current()],
+            statistics=parse_statistics(self.statistics_entry.get()),
+            bin_minutes=float(self.bin_minutes_entry.get() or 0),
+            parquet_dataset=self.parquet_dataset_var.get(),
+            registers=parse_registers(self.registers_entry.get()),
+            parse_cache=self.parse_cache_var.get(),
+            event_store=self.event_store_var.get(),
+        )
+    
     def validate_config(self):
         """Validate that all necessary configuration is complete"""
         if self.catalog_df is None:
@@ -674,244 +1019,46 @@ class CSVTrialExtractor:
             return False
         
         # Check at least one marker is configured
-        configured_markers = [m for m in self.markers if m['state_combo'].get()]
-        if not configured_markers:
+        if not self.markers:
             messagebox.showerror("Error", "Please configure at least one marker")
             return False
         
-        return True
-    
-    def process_file(self, filename, output_dir):
-        """Process a single CSV file"""
         try:
-            # Try to find the CSV file
-            csv_path = os.path.join(self.catalog_dir, 'data', filename)
-            if not os.path.exists(csv_path):
-                csv_path = os.path.join(self.catalog_dir, filename)
-            
-            if not os.path.exists(csv_path):
-                # File not found - return empty result with "not present"
-                result = {'filename': filename.replace('.csv', '.xlsx'), 'status': 'not present'}
-                for i, marker in enumerate(self.markers):
-                    if marker['state_combo'].get():
-                        marker_name = marker['state_combo'].get()
-                        result[f'{marker_name}_sum'] = 'not present'
-                        result[f'{marker_name}_avg_time'] = 'not present'
-                        if marker['reward_var'].get() and marker['reward_combo'].get():
-                            reward_name = marker['reward_combo'].get()
-                            result[f'{marker_name}_reward_{reward_name}_sum'] = 'not present'
-                            result[f'{marker_name}_reward_{reward_name}_avg_time'] = 'not present'
-                return result
-            
-            # Read header (first 11 rows)
-            with open(csv_path, 'r', encoding='latin-1') as f:
-                header_lines = [f.readline() for _ in range(11)]
-            
-            # Read CSV data
-            df = pd.read_csv(
-                csv_path,
-                skiprows=11,
-                usecols=range(8),
-                encoding='latin-1',
-                header=None,
-                names=['Num_line', 'S', 'MS', 'Cat', 'Num_cat', 'state', 'Display', 'null']
-            )
-            
-            # Extract trials
-            trials_df = self.extract_trials(df)
-            
-            # Create Excel output
-            output_filename = filename.replace('.csv', '.xlsx')
-            output_path = os.path.join(output_dir, output_filename)
-            
-            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                # Sheet 1: raw
-                df.to_excel(writer, sheet_name='raw', index=False)
-                
-                # Sheet 2: trial
-                trials_df.to_excel(writer, sheet_name='trial', index=False)
-                
-                # Sheet 3: header
-                header_df = pd.DataFrame({'Header': [line.strip() for line in header_lines]})
-                header_df.to_excel(writer, sheet_name='header', index=False)
-            
-            # Calculate aggregation data
-            result = {'filename': output_filename, 'status': 'processed'}
-            for i, marker in enumerate(self.markers):
-                if marker['state_combo'].get():
-                    marker_name = marker['state_combo'].get()
-                    
-                    # Use actual marker name in column headers
-                    presence_col = f'{marker_name}_present'
-                    time_col = f'{marker_name}_time_ms'
-                    if presence_col in trials_df.columns:
-                        result[f'{marker_name}_sum'] = trials_df[presence_col].sum()
-                        present_times = trials_df[trials_df[presence_col] == 1][time_col]
-                        result[f'{marker_name}_avg_time'] = present_times.mean() if len(present_times) > 0 else 0
-                    else:
-                        result[f'{marker_name}_sum'] = 0
-                        result[f'{marker_name}_avg_time'] = 0
-                    
-                    # Reward marker if applicable
-                    if marker['reward_var'].get() and marker['reward_combo'].get():
-                        reward_name = marker['reward_combo'].get()
-                        reward_presence_col = f'{marker_name}_reward_{reward_name}_present'
-                        reward_time_col = f'{marker_name}_reward_{reward_name}_time_ms'
-                        if reward_presence_col in trials_df.columns:
-                            result[f'{marker_name}_reward_{reward_name}_sum'] = trials_df[reward_presence_col].sum()
-                            present_reward_times = trials_df[trials_df[reward_presence_col] == 1][reward_time_col]
-                            result[f'{marker_name}_reward_{reward_name}_avg_time'] = present_reward_times.mean() if len(present_reward_times) > 0 else 0
-                        else:
-                            result[f'{marker_name}_reward_{reward_name}_sum'] = 0
-                            result[f'{marker_name}_reward_{reward_name}_avg_time'] = 0
-            
-            return result
-            
-        except Exception as e:
-            # Error processing file - return error status
-            result = {'filename': filename.replace('.csv', '.xlsx'), 'status': f'error: {str(e)}'}
-            return result
-    
-    def extract_trials(self, df):
-        """Extract trial data from dataframe"""
-        separator = self.trial_sep_combo.get()
-        cat_value = self.cat_combo.get()
-        
-        # Find trial starts
-        # state == separator (column F) AND Cat == selected value (column D)
-        if cat_value == "Both":
-            # If "Both" selected, find all rows with the separator regardless of Cat
-            trial_starts = df[df['state'] == separator].index.tolist()
-        else:
-            # Find rows where state == separator AND Cat == selected value (Entry or Exit)
-            trial_starts = df[(df['state'] == separator) & (df['Cat'] == cat_value)].index.tolist()
-        
-        trial_data = []
-        
-        for trial_num, start_idx in enumerate(trial_starts, 1):
-            # Determine trial end
-            if trial_num < len(trial_starts):
-                end_idx = trial_starts[trial_num]
-            else:
-                end_idx = len(df)
-            
-            # Check if trial contains 'Finish' - if so, skip
-            trial_segment = df.iloc[start_idx:end_idx]
-            if 'Finish' in trial_segment['Cat'].values:
-                continue
-            
-            # Calculate trial start time in MS
-            start_row = df.iloc[start_idx]
-            trial_start_time = start_row['S'] * 1000 + start_row['MS']
-            
-            # Initialize trial record
-            trial_record = {
-                'trial_num': trial_num,
-                'start_line': start_idx,
-                'stop_line': end_idx - 1,
-                'trial_start_time_ms': trial_start_time
-            }
-            
-            # Check each configured marker
-            for i, marker in enumerate(self.markers):
-                marker_state = marker['state_combo'].get()
-                if not marker_state:
-                    continue
-                
-                # Use actual marker name in column headers
-                # Find marker in trial segment
-                marker_rows = trial_segment[trial_segment['state'] == marker_state]
-                if len(marker_rows) > 0:
-                    # Marker present
-                    marker_row = marker_rows.iloc[0]
-                    marker_time = marker_row['S'] * 1000 + marker_row['MS']
-                    relative_time = marker_time - trial_start_time
-                    
-                    trial_record[f'{marker_state}_present'] = 1
-                    trial_record[f'{marker_state}_time_ms'] = relative_time
-                else:
-                    # Marker not present
-                    trial_record[f'{marker_state}_present'] = 0
-                    trial_record[f'{marker_state}_time_ms'] = 0
-                
-                # Check reward marker if applicable
-                if marker['reward_var'].get() and marker['reward_combo'].get():
-                    reward_state = marker['reward_combo'].get()
-                    reward_rows = trial_segment[trial_segment['state'] == reward_state]
-                    if len(reward_rows) > 0:
-                        reward_row = reward_rows.iloc[0]
-                        reward_time = reward_row['S'] * 1000 + reward_row['MS']
-                        reward_relative_time = reward_time - trial_start_time
-                        
-                        trial_record[f'{marker_state}_reward_{reward_state}_present'] = 1
-                        trial_record[f'{marker_state}_reward_{reward_state}_time_ms'] = reward_relative_time
-                    else:
-                        trial_record[f'{marker_state}_reward_{reward_state}_present'] = 0
-                        trial_record[f'{marker_state}_reward_{reward_state}_time_ms'] = 0
-            
-            trial_data.append(trial_record)
-        
-        return pd.DataFrame(trial_data)
-    
-    def create_aggregated_file(self, agg_data, output_dir, exp_type):
-        """Create aggregated Excel file with summary statistics"""
-        catalog_name = Path(self.catalog_path).stem
-        agg_filename = f"{catalog_name}_{self.sheet_name}_{exp_type}.xlsx"
-        agg_path = os.path.join(output_dir, agg_filename)
-        
-        agg_df = pd.DataFrame(agg_data)
-        
-        # Reorder columns for better readability
-        cols = ['filename', 'status']
-        for col in agg_df.columns:
-            if col not in cols:
-                cols.append(col)
-        
-        agg_df = agg_df[cols]
-        
-        # TODO #2: Create parameters sheet with GUI configuration
-        params_data = {
-            'Parameter': [
-                'Catalog File',
-                'Sheet Name',
-                'Filename Column',
-                'Experiment Type Column',
-                'Experiment Type Filter',
-                'Trial Separator (state)',
-                'Cat Value',
-                '---Markers Configuration---',
-            ],
-            'Value': [
-                Path(self.catalog_path).name,
-                self.sheet_name,
-                self.filename_col_combo.get(),
-                self.exptype_col_combo.get(),
-                self.exptype_filter_combo.get(),
-                self.trial_sep_combo.get(),
-                self.cat_combo.get(),
-                '',
-            ]
-        }
-        
-        # Add marker configurations
-        for i, marker in enumerate(self.markers, 1):
-            if marker['state_combo'].get():
-                params_data['Parameter'].append(f'Marker {i}')
-                params_data['Value'].append(marker['state_combo'].get())
-                
-                if marker['reward_var'].get() and marker['reward_combo'].get():
-                    params_data['Parameter'].append(f'  - Reward for Marker {i}')
-                    params_data['Value'].append(marker['reward_combo'].get())
+            parse_statistics(self.statistics_entry.get())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return False
         
-        params_df = pd.DataFrame(params_data)
+        try:
+            if float(self.bin_minutes_entry.get() or 0) < 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Time bins must be a number of minutes (0 = off)")
+            return False
         
-        # Write both sheets to Excel
-        with pd.ExcelWriter(agg_path, engine='openpyxl') as writer:
-            agg_df.to_excel(writer, sheet_name='aggregated_data', index=False)
-            params_df.to_excel(writer, sheet_name='parameters', index=False)
+        return True
+
+
+def progress_text(first, latest):
+    """Progress label: files done, rate and estimated time left.
+    
+    ``first`` and ``latest`` are (index, total, time) progress reports; the
+    rate is measured from the first one, so resumed or skipped files do not
+    inflate it.
+    """
+    first_idx, _, first_time = first
+    idx, total_files, now = latest
+    text = f"Crunching {idx} out of {total_files}"
+    if idx > first_idx and now > first_time:
+        rate = (idx - first_idx) / (now - first_time)
+        remaining = max(total_files - idx, 0) / rate
+        minutes, seconds = divmod(int(remaining + 0.5), 60)
+        text += f" - {rate:.1f} files/s, about {minutes} min {seconds:02d} s left"
+    return text
 
 
 def main():
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = CSVTrialExtractor(root)
     root.mainloop()
@@ -0,0 +1,141 @@
+"""
+Dataset Output
+==============
+Parquet dataset of the extraction results, for analysis scripts that would
+otherwise read the Excel workbooks back with pd.read_excel:
+
+    processed_data/dataset/
+        trials/exptype=<type>/animal=<subject>/<session>.parquet
+        sessions/exptype=<type>/animal=<subject>/<session>.parquet
+        bins/exptype=<type>/animal=<subject>/<session>.parquet   (time bins on)
+
+``trials`` holds the trial table of every session, ``sessions`` one row per
+session (header information and the aggregated statistics) and ``bins`` the
+per-bin statistics in long format. All are partitioned Hive-style by
+experiment type and animal (the Subject line of the session header), so a reader can load just the partitions and columns it
+needs, with their types:
+
+    read_dataset('processed_data/dataset', 'trials', filters=[('animal', '=', '665')],
+                 columns=['session', 'trial_num', 'On1A2_time_ms'])
+
+Each session is its own file, so re-processing a session replaces exactly
+its rows, and sessions skipped by an incremental run keep theirs. Each file
+has the columns of its own session: with 'all' registers, sessions writing
+different registers have different reg_* columns. read_dataset reads every
+file with the union of their schemas and the partition keys as strings;
+a plain pd.read_parquet on the folder takes the schema of one file and
+drops the columns the others add.
+
+Requirements:  pip install pandas pyarrow  (or fastparquet, for writing only)
+"""
+
+import os
+import re
+
+import pandas as pd
+
+from output_fingerprint import atomic_write
+from session_parser import header_fields
+
+
+UNKNOWN_ANIMAL = 'unknown'
+
+# Header lines copied into the sessions table
+_SESSION_HEADER = {'Protocol': 'protocol', 'Date': 'date', 'Time': 'start_time'}
+
+
+def dataset_dir(output_dir: str) -> str:
+    return os.path.join(output_dir, 'dataset')
+
+
+def partition_value(value) -> str:
+    """Partition directory value: path separators and '=' are replaced by '_'."""
+    text = re.sub(r'[\\/=:*?"<>|]', '_', str(value).strip())
+    return text or UNKNOWN_ANIMAL
+
+
+def _partitioning():
+    """Hive partitioning with string keys (animal=665 would otherwise be read as an integer)."""
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(pa.schema([('exptype', pa.string()), ('animal', pa.string())]), flavor='hive')
+
+
+def read_dataset(root: str, table: str, columns: list[str] | None = None,
+                 filters=None) -> pd.DataFrame:
+    """Read one table of the dataset ('trials', 'sessions' or 'bins').
+
+    Every file is read with the union of the file schemas (columns missing
+    from a session come back as nulls, numeric types are widened), and
+    ``exptype``/``animal`` are strings. ``columns`` and ``filters`` are as
+    for pd.read_parquet. Needs pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    path = os.path.join(root, table)
+    partitioning = _partitioning()
+    files = ds.dataset(path, format='parquet', partitioning=partitioning)
+    schema = pa.unify_schemas([fragment.physical_schema for fragment in files.get_fragments()]
+                              + [partitioning.schema], promote_options='permissive')
+    return pd.read_parquet(path, columns=columns, filters=filters, schema=schema,
+                           partitioning=partitioning)
+
+
+def session_stem(filename: str) -> str:
+    return filename[:-4] if filename.lower().endswith('.csv') else filename
+
+
+def _partition_path(root: str, table: str, exptype: str, animal: str, stem: str) -> str:
+    folder = os.path.join(root, table, f"exptype={partition_value(exptype)}",
+                          f"animal={partition_value(animal)}")
+    return os.path.join(folder, f"{stem}.parquet")
+
+
+def _write_table(path: str, table: pd.DataFrame | None) -> list[str]:
+    """Write one session's part of a table; an empty part removes the old file.
+
+    The partition folder is only created for a file actually written.
+    Returns the path written (none for an empty part).
+    """
+    if table is None or table.empty:
+        if os.path.exists(path):
+            os.remove(path)
+        return []
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, lambda tmp_path: table.to_parquet(tmp_path, index=False))
+    return [path]
+
+
+def write_session_dataset(root: str, exptype: str, filename: str, header_lines: list[str],
+                          output_file: str, trials_df: pd.DataFrame, summary: dict,
+                          bins_df: pd.DataFrame | None = None) -> list[str]:
+    """Write the trial table, session row and bins of one processed session.
+
+    ``summary`` holds the aggregated statistics of the session. The partition
+    columns (exptype, animal) live in the folder names only. Returns the
+    paths of the files written.
+    """
+    header = header_fields(header_lines)
+    animal = header.get('Subject') or UNKNOWN_ANIMAL
+    stem = session_stem(filename)
+
+    def with_session(table):
+        table = table.copy()
+        table.insert(0, 'session', stem)
+        return table
+
+    # Sessions without trials contribute no trial rows (and no schema)
+    written = _write_table(_partition_path(root, 'trials', exptype, animal, stem), with_session(trials_df))
+    written += _write_table(_partition_path(root, 'bins', exptype, animal, stem),
+                            with_session(bins_df) if bins_df is not None else None)
+
+    session = {'session': stem}
+    for line_name, column in _SESSION_HEADER.items():
+        session[column] = header.get(line_name, '')
+    session['output_file'] = output_file
+    session['trials'] = len(trials_df)
+    session.update(summary)
+    written += _write_table(_partition_path(root, 'sessions', exptype, animal, stem), pd.DataFrame([session]))
+    return written
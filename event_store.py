@@ -0,0 +1,217 @@
+"""
+Event Store
+===========
+Optional SQLite database holding the parsed events of every session the
+extractor has seen, so cross-session questions ("all MagEntry latencies of
+animal 665 in August") become one indexed query instead of re-parsing every
+CSV:
+
+    processed_data/events.sqlite
+        sessions  one row per session: source (catalog filename), path,
+                  subject, protocol, date, start_time (from the header),
+                  events, and the size/mtime/hash of its CSV
+        events    one row per event: session_id and the typed columns of
+                  parse_events (Num_line, S, MS, time_ms, Cat, Num_cat,
+                  state, Display, value)
+
+Indexes: sessions (subject, date), events (state) and events (session_id).
+Each session is ingested in one transaction (bulk insert of all its rows,
+replacing what the store held for it); a session whose CSV is unchanged
+(size and mtime, or else content hash) is not inserted again. Pool workers
+write to the same file: the database runs in WAL mode and writers wait for
+each other.
+
+Example:
+
+    store = EventStore('processed_data/events.sqlite')
+    store.query('''SELECT s.date, e.time_ms FROM events e JOIN sessions s USING (session_id)
+                   WHERE s.subject = ? AND s.date LIKE '2025-08-%' AND e.state = ?''',
+                ('665', 'MagEntry'))
+
+Requirements:  pip install pandas  (sqlite3 ships with Python)
+"""
+
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import pandas as pd
+
+from parse_cache import file_fingerprint
+from session_parser import EVENT_COLUMNS, header_fields
+
+
+STORE_VERSION = 1
+BUSY_TIMEOUT_S = 60          # how long a writer waits for another process
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL UNIQUE,
+    path TEXT,
+    subject TEXT,
+    protocol TEXT,
+    date TEXT,
+    start_time TEXT,
+    events INTEGER,
+    size INTEGER,
+    mtime_ns INTEGER,
+    hash TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    session_id INTEGER NOT NULL REFERENCES sessions (session_id),
+    Num_line INTEGER,
+    S INTEGER,
+    MS INTEGER,
+    time_ms INTEGER,
+    Cat TEXT,
+    Num_cat INTEGER,
+    state TEXT,
+    Display TEXT,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_subject_date ON sessions (subject, date);
+CREATE INDEX IF NOT EXISTS events_state ON events (state);
+CREATE INDEX IF NOT EXISTS events_session ON events (session_id);
+PRAGMA user_version = {STORE_VERSION};
+"""
+
+# Header lines stored in the sessions table
+_SESSION_HEADER = {'Subject': 'subject', 'Protocol': 'protocol', 'Date': 'date', 'Time': 'start_time'}
+
+_CATEGORICAL = ['Cat', 'state', 'Display']
+
+
+def _column_values(df: pd.DataFrame, column: str) -> list:
+    """Python values of one event column, None for missing values and absent columns."""
+    if column not in df.columns:
+        return [None] * len(df)
+    series = df[column]
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+class EventStore:
+    """Sessions and events of a batch in one SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with self._connect() as connection:
+            version = connection.execute('PRAGMA user_version').fetchone()[0]
+            if version not in (0, STORE_VERSION):
+                raise ValueError(f"Event store {path} has version {version} (expected {STORE_VERSION})")
+            connection.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Connection running one transaction: committed on success, rolled back on error."""
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_S)
+        try:
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    # ──────────────────────────────────────────────────────────────────────────
+    # Ingest
+    # ──────────────────────────────────────────────────────────────────────────
+
+    def is_fresh(self, source: str, csv_path: str, data: bytes | None = None) -> bool:
+        """Whether the store already holds the current content of a session."""
+        with self._connect() as connection:
+            entry = connection.execute('SELECT size, mtime_ns, hash FROM sessions WHERE source = ?',
+                                       (source,)).fetchone()
+            if entry is None:
+                return False
+            stat = os.stat(csv_path)
+            if (stat.st_size, stat.st_mtime_ns) == entry[:2]:
+                return True
+
+            # Touched or copied: only the content decides
+            fingerprint = file_fingerprint(csv_path, data)
+            if fingerprint['hash'] != entry[2]:
+                return False
+            connection.execute('UPDATE sessions SET size = ?, mtime_ns = ? WHERE source = ?',
+                               (fingerprint['size'], fingerprint['mtime_ns'], source))
+            return True
+
+    def ingest(self, source: str, csv_path: str, header_lines: list[str], df: pd.DataFrame,
+               fingerprint: dict | None = None):
+        """Store (or replace) the header and events of one session in one transaction.
+
+        ``source`` is the catalog filename of the session; ``fingerprint`` its
+        size/mtime/hash if already known (else the file is hashed).
+        """
+        header = header_fields(header_lines)
+        if fingerprint is None:
+            fingerprint = file_fingerprint(csv_path)
+        session = {column: header.get(line_name) for line_name, column in _SESSION_HEADER.items()}
+        rows = zip(*(_column_values(df, column) for column in EVENT_COLUMNS))
+
+        with self._connect() as connection:
+            previous = connection.execute('SELECT session_id FROM sessions WHERE source = ?',
+                                          (source,)).fetchone()
+            if previous is not None:
+                connection.execute('DELETE FROM events WHERE session_id = ?', previous)
+                connection.execute('DELETE FROM sessions WHERE session_id = ?', previous)
+            session_id = connection.execute(
+                'INSERT INTO sessions (source, path, subject, protocol, date, start_time, events, '
+                'size, mtime_ns, hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (source, os.path.abspath(csv_path), session['subject'], session['protocol'],
+                 session['date'], session['start_time'], len(df),
+                 fingerprint['size'], fingerprint['mtime_ns'], fingerprint['hash'])).lastrowid
+            connection.executemany(
+                f"INSERT INTO events (session_id, {', '.join(EVENT_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(EVENT_COLUMNS) + 1))})",
+                ((session_id, *row) for row in rows))
+
+    # ──────────────────────────────────────────────────────────────────────────
+    # Queries
+    # ──────────────────────────────────────────────────────────────────────────
+
+    def query(self, sql: str, params=()) -> pd.DataFrame:
+        """Result of any SQL query on the store as a DataFrame."""
+        with self._connect() as connection:
+            return pd.read_sql_query(sql, connection, params=params)
+
+    def sessions(self) -> pd.DataFrame:
+        return self.query('SELECT * FROM sessions ORDER BY subject, date, start_time')
+
+    def session_events(self, source: str) -> pd.DataFrame:
+        """Event table of one stored session, typed as parse_events returns it."""
+        df = self.query(f"SELECT {', '.join(EVENT_COLUMNS)} FROM events "
+                        f"WHERE session_id = (SELECT session_id FROM sessions WHERE source = ?) "
+                        f"ORDER BY rowid", (source,))
+        for column in _CATEGORICAL:
+            df[column] = df[column].astype('category')
+        df['Num_cat'] = df['Num_cat'].astype('Int64')
+        df['value'] = df['value'].astype(float)
+        return df
+
+    def events(self, states: list[str] | None = None, subject: str | None = None,
+               date_from: str | None = None, date_to: str | None = None) -> pd.DataFrame:
+        """Events of every stored session matching the filters, with their session columns.
+
+        Dates compare as text, so use the header format (YYYY-MM-DD); both
+        bounds are inclusive.
+        """
+        conditions, params = [], []
+        if states:
+            conditions.append(f"e.state IN ({', '.join('?' * len(states))})")
+            params += list(states)
+        if subject is not None:
+            conditions.append('s.subject = ?')
+            params.append(subject)
+        if date_from is not None:
+            conditions.append('s.date >= ?')
+            params.append(date_from)
+        if date_to is not None:
+            conditions.append('s.date <= ?')
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return self.query(
+            f"SELECT s.source, s.subject, s.date, {', '.join('e.' + c for c in EVENT_COLUMNS)} "
+            f"FROM events e JOIN sessions s USING (session_id) {where} "
+            f"ORDER BY s.subject, s.date, s.start_time, e.rowid", params)
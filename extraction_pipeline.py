@@ -0,0 +1,1072 @@
+"""
+Extraction Pipeline
+===================
+Display-free core of the CSV Trial Extractor: reads the catalog, processes
+every session CSV of one experiment type (or of several extraction profiles
+in one pass) and writes the per-session and aggregated workbooks.
+
+The GUI (csv_trial_extractor.py) and the headless batch runner
+(csv_batch_extractor.py) both drive this module through an ExtractionConfig.
+
+Requirements:  pip install pandas numpy openpyxl
+"""
+
+import cProfile
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pandas as pd
+
+from csv_resolver import CsvResolver
+from dataset_output import dataset_dir, write_session_dataset
+from event_store import EventStore
+from output_fingerprint import atomic_write, forget_outputs, output_fingerprint, outputs_current, record_outputs
+from marker_statistics import DEFAULT_STATISTICS, binned_columns, parse_statistics, summarize_bins, summarize_markers
+from parse_cache import DEFAULT_MAX_MB, ParseCache, file_fingerprint
+from processing_manifest import ProcessingManifest
+from register_values import add_trial_registers, last_register_values, parse_registers
+from run_journal import RunJournal
+from session_parser import EVENT_COLUMNS, SessionReader, parse_events, parse_header, read_session_bytes
+from session_prefetch import SessionPrefetcher
+from stage_timings import StageTimer, timings_frame, write_timings_json
+from state_vocabulary import BatchVocabulary
+from trial_segmentation import DEFAULT_INCOMPLETE_CAT, event_times_ms, segment_trials
+
+
+# Per-session output formats: mode -> description shown in the GUI / CLI help
+OUTPUT_MODES = {
+    'xlsx': "Excel workbook (raw, trial, header)",
+    'xlsx_no_raw': "Excel workbook without the raw sheet",
+    'xlsx_streaming': "Excel workbook, constant-memory writer (needs xlsxwriter)",
+    'csv': "CSV files (_raw, _trial, _header)",
+    'parquet': "Parquet files (_raw, _trial, _header; needs pyarrow)",
+}
+
+
+# Optional packages an output mode depends on (any one of them is enough)
+_OUTPUT_MODE_PACKAGES = {
+    'xlsx_streaming': ['xlsxwriter'],
+    'parquet': ['pyarrow', 'fastparquet'],
+}
+
+
+# Sessions at least this large are memory-mapped instead of read into memory
+DEFAULT_MMAP_THRESHOLD_MB = 64
+
+# Memory a sequential run may hold in session files read ahead (0: no read-ahead)
+DEFAULT_PREFETCH_MB = 256
+
+# Rows converted to Python values at a time by the xlsx_streaming writer
+_STREAMING_ROWS = 10_000
+
+# Event columns segment_trials needs (all of them are kept when the raw table is written)
+_SEGMENTATION_COLUMNS = ['time_ms', 'Cat', 'state']
+
+
+# Vocabulary of a pool worker process, shared by every session it handles
+_WORKER_VOCABULARY = BatchVocabulary()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Configuration
+# ──────────────────────────────────────────────────────────────────────────────
+
+@dataclass
+class MarkerSpec:
+    """One marker to track in every trial, with an optional reward state."""
+    state: str
+    reward_state: str | None = None
+
+
+@dataclass
+class ExtractionConfig:
+    """Everything an extraction run needs, independent of any widget."""
+    catalog_path: str
+    sheet_name: str
+    filename_column: str
+    exptype_column: str
+    exptype: str
+    separator: str
+    cat_value: str
+    incomplete_cat: str = DEFAULT_INCOMPLETE_CAT
+    markers: list[MarkerSpec] = field(default_factory=list)
+    output_mode: str = 'xlsx'
+    statistics: list[str] = field(default_factory=lambda: list(DEFAULT_STATISTICS))
+    bin_minutes: float = 0          # time-binned statistics every N minutes (0: off)
+    parquet_dataset: bool = False   # also write processed_data/dataset/ (dataset_output.py)
+    registers: list[str] = field(default_factory=list)   # Reg/List values to extract ('all': every one)
+
+    # Run settings (not extraction parameters, so not written to the parameters sheet)
+    parse_cache: bool = True
+    cache_max_mb: float = DEFAULT_MAX_MB
+    mmap_threshold_mb: float = DEFAULT_MMAP_THRESHOLD_MB
+    prefetch_mb: float = DEFAULT_PREFETCH_MB
+    event_store: bool = False       # load every parsed session into processed_data/events.sqlite
+
+    @property
+    def catalog_dir(self) -> str:
+        return os.path.dirname(os.path.abspath(self.catalog_path))
+
+    @property
+    def output_dir(self) -> str:
+        return os.path.join(self.catalog_dir, 'processed_data')
+
+    def marker_pairs(self) -> list[tuple[str, str | None]]:
+        """(marker_state, reward_state) pairs as used by segment_trials."""
+        return [(m.state, m.reward_state or None) for m in self.markers if m.state]
+
+    def marker_prefixes(self) -> list[str]:
+        """Column prefixes of the markers and rewards in the trial table."""
+        prefixes = []
+        for marker_name, reward_name in self.marker_pairs():
+            prefixes.append(marker_name)
+            if reward_name:
+                prefixes.append(f'{marker_name}_reward_{reward_name}')
+        return prefixes
+
+    def validate(self):
+        """Raise ValueError naming the first missing setting."""
+        required = [
+            ('Catalog File', self.catalog_path),
+            ('Sheet Name', self.sheet_name),
+            ('Filename Column', self.filename_column),
+            ('Experiment Type Column', self.exptype_column),
+            ('Experiment Type Filter', self.exptype),
+            ('Trial Separator (state)', self.separator),
+            ('Cat Value', self.cat_value),
+        ]
+        for name, value in required:
+            if not value:
+                raise ValueError(f"Missing configuration value: {name}")
+        if not self.marker_pairs():
+            raise ValueError("At least one marker must be configured")
+        if not self.statistics:
+            raise ValueError("At least one statistic must be selected")
+        parse_statistics(','.join(self.statistics))
+        if self.bin_minutes < 0:
+            raise ValueError("The time bin must be a positive number of minutes (0: no bins)")
+        if self.output_mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode '{self.output_mode}' "
+                             f"(choose from {', '.join(OUTPUT_MODES)})")
+        packages = _OUTPUT_MODE_PACKAGES.get(self.output_mode, [])
+        if packages and not any(importlib.util.find_spec(p) for p in packages):
+            raise ValueError(f"Output mode '{self.output_mode}' needs: pip install {packages[0]}")
+        packages = _OUTPUT_MODE_PACKAGES['parquet']
+        if self.parquet_dataset and not any(importlib.util.find_spec(p) for p in packages):
+            raise ValueError(f"The Parquet dataset needs: pip install {packages[0]}")
+
+    def to_parameters(self) -> pd.DataFrame:
+        """Parameters sheet written next to the aggregated data."""
+        params_data = {
+            'Parameter': [
+                'Catalog File',
+                'Catalog Path',
+                'Sheet Name',
+                'Filename Column',
+                'Experiment Type Column',
+                'Experiment Type Filter',
+                'Trial Separator (state)',
+                'Cat Value',
+                'Incomplete Trial Cat',
+                'Output Mode',
+                'Statistics',
+                'Time Bin (min)',
+                'Parquet Dataset',
+                'Registers',
+                '---Markers Configuration---',
+            ],
+            'Value': [
+                Path(self.catalog_path).name,
+                os.path.abspath(self.catalog_path),
+                self.sheet_name,
+                self.filename_column,
+                self.exptype_column,
+                self.exptype,
+                self.separator,
+                self.cat_value,
+                self.incomplete_cat,
+                self.output_mode,
+                ', '.join(self.statistics),
+                f'{self.bin_minutes:g}',
+                'yes' if self.parquet_dataset else 'no',
+                ', '.join(self.registers),
+                '',
+            ]
+        }
+
+        # Add marker configurations
+        for i, marker in enumerate(self.markers, 1):
+            params_data['Parameter'].append(f'Marker {i}')
+            params_data['Value'].append(marker.state)
+
+            if marker.reward_state:
+                params_data['Parameter'].append(f'  - Reward for Marker {i}')
+                params_data['Value'].append(marker.reward_state)
+
+        return pd.DataFrame(params_data)
+
+    def fingerprint(self) -> str:
+        """Hash of the extraction parameters (run settings excluded)."""
+        params = self.to_parameters()
+        text = json.dumps(list(zip(params['Parameter'], params['Value'])))
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+    @classmethod
+    def from_parameters(cls, params_df: pd.DataFrame, catalog_path: str | None = None):
+        """Rebuild a configuration from a parameters sheet (Parameter/Value)."""
+        values = {}
+        markers = {}
+        for parameter, value in zip(params_df['Parameter'], params_df['Value']):
+            parameter = str(parameter).strip()
+            value = '' if pd.isna(value) else str(value).strip()
+
+            reward_match = re.fullmatch(r'- Reward for Marker (\d+)', parameter)
+            marker_match = re.fullmatch(r'Marker (\d+)', parameter)
+            if reward_match:
+                markers.setdefault(int(reward_match.group(1)), MarkerSpec('')).reward_state = value or None
+            elif marker_match:
+                markers.setdefault(int(marker_match.group(1)), MarkerSpec('')).state = value
+            else:
+                values[parameter] = value
+
+        if catalog_path is None:
+            catalog_path = values.get('Catalog Path') or values.get('Catalog File', '')
+
+        return cls(
+            catalog_path=catalog_path,
+            sheet_name=values.get('Sheet Name', ''),
+            filename_column=values.get('Filename Column', ''),
+            exptype_column=values.get('Experiment Type Column', ''),
+            exptype=values.get('Experiment Type Filter', ''),
+            separator=values.get('Trial Separator (state)', ''),
+            cat_value=values.get('Cat Value', ''),
+            incomplete_cat=values.get('Incomplete Trial Cat', DEFAULT_INCOMPLETE_CAT),
+            output_mode=values.get('Output Mode') or 'xlsx',
+            statistics=parse_statistics(values.get('Statistics', '')),
+            bin_minutes=float(values.get('Time Bin (min)') or 0),
+            parquet_dataset=values.get('Parquet Dataset', 'no').lower() == 'yes',
+            registers=parse_registers(values.get('Registers', '')),
+            markers=[markers[i] for i in sorted(markers) if markers[i].state],
+        )
+
+
+def load_config(config_path: str) -> ExtractionConfig:
+    """Load a configuration from a parameters sheet.
+
+    Accepts an aggregated workbook (its 'parameters' sheet is read) or a CSV
+    file with the same Parameter/Value columns. A catalog given by name only
+    is looked up next to the config file and in its parent folder, which is
+    where the catalog sits relative to processed_data/.
+    """
+    if config_path.lower().endswith('.csv'):
+        params_df = pd.read_csv(config_path, dtype=str, keep_default_na=False)
+    else:
+        params_df = pd.read_excel(config_path, sheet_name='parameters', dtype=str, engine='openpyxl')
+
+    config = ExtractionConfig.from_parameters(params_df)
+
+    if config.catalog_path and not os.path.exists(config.catalog_path):
+        config_dir = os.path.dirname(os.path.abspath(config_path))
+        name = Path(config.catalog_path).name
+        for candidate in (os.path.join(config_dir, name),
+                          os.path.join(os.path.dirname(config_dir), name)):
+            if os.path.exists(candidate):
+                config.catalog_path = candidate
+                break
+
+    return config
+
+
+def save_config(config: ExtractionConfig, config_path: str):
+    """Save a configuration as a Parameter/Value CSV (an extraction profile)."""
+    config.to_parameters().to_csv(config_path, index=False)
+
+
+def load_markers(markers_path: str) -> list[MarkerSpec]:
+    """Load a marker list: a CSV or workbook with Marker and Reward State columns.
+
+    A profile or aggregated workbook (Parameter/Value sheet) is accepted too;
+    its markers are used. Rows without a marker state are skipped.
+    """
+    if markers_path.lower().endswith('.csv'):
+        markers_df = pd.read_csv(markers_path, dtype=str, keep_default_na=False)
+    else:
+        with pd.ExcelFile(markers_path, engine='openpyxl') as workbook:
+            sheet = 'parameters' if 'parameters' in workbook.sheet_names else 0
+            markers_df = workbook.parse(sheet, dtype=str)
+
+    if 'Parameter' in markers_df.columns:
+        return ExtractionConfig.from_parameters(markers_df).markers
+    if 'Marker' not in markers_df.columns:
+        raise ValueError(f"{Path(markers_path).name} has no 'Marker' column")
+
+    rewards = markers_df['Reward State'] if 'Reward State' in markers_df.columns else [''] * len(markers_df)
+    markers = []
+    for state, reward_state in zip(markers_df['Marker'], rewards):
+        state = '' if pd.isna(state) else str(state).strip()
+        reward_state = '' if pd.isna(reward_state) else str(reward_state).strip()
+        if state:
+            markers.append(MarkerSpec(state, reward_state or None))
+    return markers
+
+
+def save_markers(markers: list[MarkerSpec], markers_path: str):
+    """Save a marker list as a Marker / Reward State CSV."""
+    pd.DataFrame({'Marker': [m.state for m in markers],
+                  'Reward State': [m.reward_state or '' for m in markers]}).to_csv(markers_path, index=False)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Catalog & session files
+# ──────────────────────────────────────────────────────────────────────────────
+
+def read_catalog(config: ExtractionConfig) -> pd.DataFrame:
+    return pd.read_excel(config.catalog_path, sheet_name=config.sheet_name, engine='openpyxl')
+
+
+def catalog_file_list(catalog_df: pd.DataFrame, filename_col: str,
+                      exptype_col: str | None = None, exp_filter: str | None = None) -> list[str]:
+    """CSV filenames of the catalog rows, optionally filtered by experiment type."""
+    if exptype_col and exp_filter:
+        catalog_df = catalog_df[catalog_df[exptype_col] == exp_filter]
+
+    file_list = []
+    for fname in catalog_df[filename_col]:
+        fname = str(fname).strip()
+        if fname and fname.lower() != 'nan':
+            if not fname.endswith('.csv'):
+                fname = fname + '.csv'
+            file_list.append(fname)
+    return file_list
+
+
+def resolve_csv_path(catalog_dir: str, filename: str) -> str | None:
+    """Locate a single session CSV in catalog_dir/data or catalog_dir.
+
+    Use a CsvResolver to look up many files.
+    """
+    return CsvResolver(catalog_dir).resolve(filename)
+
+
+def unresolved_files(configs: list[ExtractionConfig], catalog_df: pd.DataFrame,
+                     resolver: CsvResolver | None = None) -> list[str]:
+    """Catalog files of the given profiles that are not on disk (reported as 'not present')."""
+    if resolver is None:
+        resolver = CsvResolver(configs[0].catalog_dir)
+    filenames = []
+    for config in configs:
+        filenames += catalog_file_list(catalog_df, config.filename_column,
+                                       config.exptype_column, config.exptype)
+    return resolver.unresolved(filenames)
+
+
+def parse_cache_dir(output_dir: str) -> str:
+    return os.path.join(output_dir, '.parse_cache')
+
+
+def is_mmap_session(config: ExtractionConfig, csv_path: str) -> bool:
+    return os.path.getsize(csv_path) >= config.mmap_threshold_mb * 1024 * 1024
+
+
+def session_columns(configs: list[ExtractionConfig]) -> list[str]:
+    """Event columns the given configurations need from a session.
+
+    Every column when one of them writes a raw table or the event store;
+    otherwise the segmentation columns, plus the register values if one of
+    them extracts registers.
+    """
+    if any(config.output_mode != 'xlsx_no_raw' or config.event_store for config in configs):
+        return EVENT_COLUMNS
+    if any(config.registers for config in configs):
+        return _SEGMENTATION_COLUMNS + ['value']
+    return _SEGMENTATION_COLUMNS
+
+
+def load_session(config: ExtractionConfig, csv_path: str, output_dir: str,
+                 timer: StageTimer | None = None, data: bytes | None = None,
+                 columns: list[str] | None = None) -> tuple[list[str], pd.DataFrame]:
+    """Header lines and typed events of a session, through the parse cache if enabled.
+
+    Sessions of at least ``mmap_threshold_mb`` are memory-mapped and bypass
+    the parse cache; only ``columns`` are decoded (by default the columns
+    ``config`` needs, see session_columns). ``data`` may hold
+    the file bytes if they were already read (prefetched). ``timer`` receives
+    the header and parse times (a parse cache lookup counts as parse).
+    """
+    if timer is None:
+        timer = StageTimer()
+    if data is None and is_mmap_session(config, csv_path):
+        if columns is None:
+            columns = session_columns([config])
+        with timer.stage('header'):
+            reader = SessionReader(csv_path)
+        with reader, timer.stage('parse'):
+            return reader.header_lines, reader.to_frame(columns)
+    if config.parse_cache:
+        with timer.stage('parse'):
+            return ParseCache(parse_cache_dir(output_dir), config.cache_max_mb).load(csv_path, data)
+    with timer.stage('header'):
+        if data is None:
+            data = read_session_bytes(csv_path)
+        header_lines = parse_header(data)
+    with timer.stage('parse'):
+        return header_lines, parse_events(data)
+
+
+def read_session_csv(csv_path: str) -> pd.DataFrame:
+    """Read the typed event rows of a session CSV (header skipped)."""
+    return parse_events(read_session_bytes(csv_path))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Session outputs
+# ──────────────────────────────────────────────────────────────────────────────
+
+def session_output_name(filename: str, output_mode: str, exptype: str | None = None) -> str:
+    """Name of a session's main output file, as listed in the aggregated data.
+
+    With ``exptype`` the name carries the experiment type (<session>_<exptype>).
+    """
+    stem = filename[:-4] if filename.endswith('.csv') else filename
+    if exptype:
+        stem = f"{stem}_{exptype}"
+    if output_mode.startswith('xlsx'):
+        return f"{stem}.xlsx"
+    return f"{stem}_trial.{output_mode}"
+
+
+def profile_output_name(config: ExtractionConfig, filename: str, shared: bool = False) -> str:
+    """Main output name of a session under one profile.
+
+    A session that is ``shared`` by several profiles of a run gets one output
+    per profile, named after its experiment type, so no profile overwrites
+    another's trial table.
+    """
+    return session_output_name(filename, config.output_mode, config.exptype if shared else None)
+
+
+def session_output_files(config: ExtractionConfig, filename: str, binned: bool = False,
+                         shared: bool = False) -> list[str]:
+    """Names of the files write_session_output writes for a session."""
+    output_filename = profile_output_name(config, filename, shared)
+    if config.output_mode.startswith('xlsx'):
+        return [output_filename]
+    stem = output_filename[:-len(f"_trial.{config.output_mode}")]
+    tables = ['raw', 'trial', 'bins', 'header'] if binned else ['raw', 'trial', 'header']
+    return [f"{stem}_{name}.{config.output_mode}" for name in tables]
+
+
+def _write_xlsx_streaming(path: str, tables: dict[str, pd.DataFrame]):
+    """Write tables as sheets with xlsxwriter's constant-memory mode.
+
+    That mode flushes every row as soon as the next one starts, so cells
+    must be written row by row (to_excel writes column by column and would
+    lose all but the first column and the last row).
+    """
+    import xlsxwriter
+
+    with xlsxwriter.Workbook(path, {'constant_memory': True}) as workbook:
+        header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'})
+        for sheet_name, table in tables.items():
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, [str(column) for column in table.columns], header_format)
+            for start in range(0, len(table), _STREAMING_ROWS):
+                chunk = table.iloc[start:start + _STREAMING_ROWS]
+                # Python values, None (an empty cell) for missing ones
+                chunk = chunk.astype(object).where(chunk.notna(), None)
+                for offset, row in enumerate(chunk.itertuples(index=False, name=None), start + 1):
+                    worksheet.write_row(offset, 0, row)
+
+
+def write_session_output(config: ExtractionConfig, output_dir: str, filename: str,
+                         df: pd.DataFrame, trials_df: pd.DataFrame, header_lines: list[str],
+                         bins_df: pd.DataFrame | None = None, shared: bool = False) -> str:
+    """Write the raw/trial/header (and bins) tables of one session in the configured mode.
+
+    Each file is written under a temporary name and renamed once complete.
+    ``shared`` is as for profile_output_name.
+    """
+    mode = config.output_mode
+    output_filename = profile_output_name(config, filename, shared)
+    header_df = pd.DataFrame({'Header': [line.strip() for line in header_lines]})
+
+    tables = {'trial': trials_df, 'header': header_df}
+    if bins_df is not None:
+        tables = {'trial': trials_df, 'bins': bins_df, 'header': header_df}
+    if mode != 'xlsx_no_raw':
+        tables = {'raw': df, **tables}
+
+    if mode.startswith('xlsx'):
+        def write(path):
+            if mode == 'xlsx_streaming':
+                # Rows are flushed as they are written instead of kept in memory
+                _write_xlsx_streaming(path, tables)
+                return
+            with pd.ExcelWriter(path, engine='openpyxl') as writer:
+                for sheet_name, table in tables.items():
+                    table.to_excel(writer, sheet_name=sheet_name, index=False)
+
+        atomic_write(os.path.join(output_dir, output_filename), write)
+    else:
+        stem = output_filename[:-len(f"_trial.{mode}")]
+        for name, table in tables.items():
+            table_path = os.path.join(output_dir, f"{stem}_{name}.{mode}")
+            if mode == 'csv':
+                atomic_write(table_path, lambda path: table.to_csv(path, index=False))
+            else:
+                atomic_write(table_path, lambda path: table.to_parquet(path, index=False))
+
+    return output_filename
+
+
+def read_session_output(config: ExtractionConfig, output_dir: str, filename: str,
+                        shared: bool = False) -> dict[str, pd.DataFrame]:
+    """Tables of a session output written by write_session_output, by sheet/table name."""
+    output_filename = profile_output_name(config, filename, shared)
+    if config.output_mode.startswith('xlsx'):
+        return pd.read_excel(os.path.join(output_dir, output_filename), sheet_name=None)
+    tables = {}
+    for name in session_output_files(config, filename, binned=True, shared=shared):
+        path = os.path.join(output_dir, name)
+        if os.path.exists(path):
+            table = name[:-len(f".{config.output_mode}")].rsplit('_', 1)[1]
+            tables[table] = pd.read_csv(path) if config.output_mode == 'csv' else pd.read_parquet(path)
+    return tables
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Processing
+# ──────────────────────────────────────────────────────────────────────────────
+
+def summarize_trials(config: ExtractionConfig, trials_df: pd.DataFrame) -> dict:
+    """Reduce a trial table to the configured statistics of every marker and reward."""
+    return summarize_markers(trials_df, config.marker_prefixes(), config.statistics)
+
+
+def summarize_session_bins(config: ExtractionConfig, df: pd.DataFrame,
+                           trials_df: pd.DataFrame) -> pd.DataFrame:
+    """Per-bin statistics of a session (bins of ``bin_minutes`` up to its last event)."""
+    times = event_times_ms(df)
+    session_end = int(times.max()) if len(times) else 0
+    return summarize_bins(trials_df, config.marker_prefixes(), config.statistics,
+                          config.bin_minutes, session_end)
+
+
+def _error_row(config: ExtractionConfig, filename: str, error: Exception, shared: bool = False) -> dict:
+    return {'filename': profile_output_name(config, filename, shared), 'status': f'error: {str(error)}'}
+
+
+def _write_outputs(config: ExtractionConfig, filename: str, output_dir: str,
+                   header_lines: list[str], df: pd.DataFrame, trials_df: pd.DataFrame,
+                   summary: dict, bins_df: pd.DataFrame | None, source_hash: str | None,
+                   shared: bool) -> str:
+    """Write the per-session outputs (and dataset files) unless identical ones exist.
+
+    With the content hash of the source CSV, the outputs are fingerprinted
+    and skipped when the fingerprint recorded next to them still matches.
+    Returns the name of the main output file.
+    """
+    output_filename = profile_output_name(config, filename, shared)
+    fingerprint = None
+    if source_hash is not None:
+        fingerprint = output_fingerprint(source_hash, config.fingerprint())
+        if outputs_current(output_dir, output_filename, fingerprint):
+            return output_filename
+    forget_outputs(output_dir, output_filename)
+
+    # Raw / trial / header (/ bins) tables
+    write_session_output(config, output_dir, filename, df, trials_df, header_lines, bins_df, shared)
+    files = session_output_files(config, filename, bins_df is not None, shared)
+    if config.parquet_dataset:
+        written = write_session_dataset(dataset_dir(output_dir), config.exptype, filename, header_lines,
+                                        output_filename, trials_df, summary, bins_df)
+        files += [os.path.relpath(path, output_dir) for path in written]
+
+    if fingerprint is not None:
+        record_outputs(output_dir, output_filename, fingerprint, files)
+    return output_filename
+
+
+def _session_row(config: ExtractionConfig, filename: str, output_dir: str,
+                 header_lines: list[str], df: pd.DataFrame, vocabulary: BatchVocabulary,
+                 timer: StageTimer, source_hash: str | None = None,
+                 shared: bool = False) -> tuple[dict, dict]:
+    """Extract, write and summarize one loaded session under one configuration.
+
+    ``source_hash`` (content hash of the CSV) lets unchanged outputs be
+    skipped; ``shared`` is as for profile_output_name. Returns the
+    aggregated row and the timing record of the file.
+    """
+    trials_df = pd.DataFrame()
+    try:
+        # Extract trials
+        with timer.stage('extract'):
+            trials_df = segment_trials(df, config.separator, config.cat_value, config.marker_pairs(),
+                                       vocabulary, config.incomplete_cat)
+            trials_df = add_trial_registers(trials_df, df, config.registers)
+
+        with timer.stage('aggregate'):
+            summary = summarize_trials(config, trials_df)
+            summary.update(last_register_values(df, config.registers))
+            bins_df = summarize_session_bins(config, df, trials_df) if config.bin_minutes else None
+
+        with timer.stage('write'):
+            output_filename = _write_outputs(config, filename, output_dir, header_lines, df, trials_df,
+                                             summary, bins_df, source_hash, shared)
+
+        with timer.stage('aggregate'):
+            result = {'filename': output_filename, 'status': 'processed'}
+            result.update(summary)
+            if bins_df is not None:
+                result.update(binned_columns(bins_df))
+
+    except Exception as e:
+        # Error processing file - return error status
+        result = _error_row(config, filename, e, shared)
+
+    return result, timer.record(filename, result['status'], len(df), len(trials_df))
+
+
+def source_fingerprint(config: ExtractionConfig, csv_path: str, output_dir: str,
+                       data: bytes | None = None, known: dict | None = None) -> dict:
+    """Size, mtime and content hash of a session CSV, read only when nothing recorded it.
+
+    ``data`` (the file bytes, if read anyway) is hashed in memory. Otherwise a
+    hash recorded for the same size and mtime is reused: ``known`` (e.g. from
+    the processing manifest), then the parse cache entry.
+    """
+    if data is not None:
+        return file_fingerprint(csv_path, data)
+    stat = os.stat(csv_path)
+    if known is not None and (known['size'], known['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+        return known
+    if config.parse_cache:
+        recorded = ParseCache(parse_cache_dir(output_dir), config.cache_max_mb).fingerprint(csv_path)
+        if recorded is not None:
+            return recorded
+    return file_fingerprint(csv_path)
+
+
+def process_session(configs: list[ExtractionConfig], filename: str, csv_path: str | None,
+                    output_dir: str, vocabulary: BatchVocabulary | None = None,
+                    data: bytes | None = None, known_fingerprint: dict | None = None,
+                    shared: bool = False) -> tuple[list[dict], str | None, dict | None, list[dict]]:
+    """Process one CSV under several configurations, reading and parsing it once.
+
+    ``csv_path`` is where the catalog file was resolved (None: not present).
+    States are matched through ``vocabulary`` (the vocabulary of this process
+    if None). Returns the aggregated row of each configuration, the source path
+    and its fingerprint for the processing manifest (None unless a row was
+    processed), and the timing record of each configuration (the header and
+    parse times are shared by all of them). ``data`` may hold the prefetched
+    bytes of the file. Outputs identical to the ones already on disk (same
+    CSV content and configuration) are not rewritten. With ``event_store``
+    set on the first configuration, the parsed session is also loaded into
+    the event store (unless it holds it already); a failure to do so goes in
+    the ``event_store`` column of the rows, not in their status. ``known_fingerprint`` is
+    a fingerprint recorded earlier for the file, reused while its size and
+    mtime match, so the CSV is not read again just to be hashed. With
+    ``shared`` (the file belongs to several profiles of the run) the output
+    names carry the experiment type of each profile.
+    """
+    if vocabulary is None:
+        vocabulary = _WORKER_VOCABULARY
+
+    if csv_path is None:
+        # File not found - return empty result with "not present"
+        rows = []
+        for config in configs:
+            result = {'filename': profile_output_name(config, filename, shared), 'status': 'not present'}
+            for key in summarize_trials(config, pd.DataFrame()):
+                result[key] = 'not present'
+            rows.append(result)
+        return rows, None, None, [StageTimer().record(filename, 'not present', 0, 0) for _ in configs]
+
+    timer = StageTimer()
+    try:
+        # One parse serves every profile: decode the columns any of them needs
+        header_lines, df = load_session(configs[0], csv_path, output_dir, timer, data,
+                                        session_columns(configs))
+        with timer.stage('header'):
+            fingerprint = source_fingerprint(configs[0], csv_path, output_dir, data, known_fingerprint)
+    except Exception as e:
+        rows = [_error_row(config, filename, e, shared) for config in configs]
+        return rows, csv_path, None, [timer.record(filename, row['status'], 0, 0) for row in rows]
+
+    # A failing event store does not fail the extraction; it is reported in its own column
+    store_error = None
+    if configs[0].event_store:
+        with timer.stage('write'):
+            try:
+                store = EventStore(event_store_path(output_dir))
+                if not store.is_fresh(filename, csv_path, data):
+                    store.ingest(filename, csv_path, header_lines, df, fingerprint)
+            except Exception as e:
+                store_error = f'error: {str(e)}'
+
+    outcomes = [_session_row(config, filename, output_dir, header_lines, df, vocabulary, timer.copy(),
+                             fingerprint['hash'], shared)
+                for config in configs]
+    rows = [row for row, _ in outcomes]
+    if store_error is not None:
+        for row in rows:
+            row['event_store'] = store_error
+    # Not recorded in the manifest: an incremental run retries the event store
+    if store_error is not None or not any(row['status'] == 'processed' for row in rows):
+        fingerprint = None
+    return rows, csv_path, fingerprint, [record for _, record in outcomes]
+
+
+def process_file(config: ExtractionConfig, filename: str, output_dir: str,
+                 vocabulary: BatchVocabulary | None = None) -> dict:
+    """Process a single CSV file and return its aggregated row"""
+    csv_path = resolve_csv_path(config.catalog_dir, filename)
+    return process_session([config], filename, csv_path, output_dir, vocabulary)[0][0]
+
+
+def aggregated_file_path(config: ExtractionConfig, output_dir: str, partial: bool = False) -> str:
+    """Path of the aggregated workbook (of a cancelled run's partial one with ``partial``)."""
+    catalog_name = Path(config.catalog_path).stem
+    suffix = '_partial' if partial else ''
+    return os.path.join(output_dir, f"{catalog_name}_{config.sheet_name}_{config.exptype}{suffix}.xlsx")
+
+
+def create_aggregated_file(config: ExtractionConfig, agg_data: list[dict], output_dir: str,
+                           timings: list[dict] | None = None, run_status: str | None = None) -> str:
+    """Create aggregated Excel file with summary statistics (and a timings sheet if given)
+
+    A ``run_status`` marks the workbook of a cancelled run: it is written to
+    the _partial path and added to the parameters sheet as 'Run Status'.
+    """
+    agg_path = aggregated_file_path(config, output_dir, partial=run_status is not None)
+
+    agg_df = pd.DataFrame(agg_data)
+
+    # Reorder columns for better readability
+    cols = ['filename', 'status']
+    if 'event_store' in agg_df.columns:
+        cols.append('event_store')
+    for col in agg_df.columns:
+        if col not in cols:
+            cols.append(col)
+
+    agg_df = agg_df[cols]
+
+    # Missing sessions read 'not present' in every statistic, including the
+    # per-bin and register columns only the sessions found could name
+    absent = agg_df['status'] == 'not present'
+    if absent.any():
+        for col in cols:
+            if col not in ('filename', 'status', 'event_store'):
+                agg_df[col] = agg_df[col].mask(absent & agg_df[col].isna(), 'not present')
+
+    params_df = config.to_parameters()
+    if run_status is not None:
+        params_df = pd.concat([params_df, pd.DataFrame({'Parameter': ['Run Status'], 'Value': [run_status]})],
+                              ignore_index=True)
+
+    # Write both sheets to Excel
+    def write(path):
+        with pd.ExcelWriter(path, engine='openpyxl') as writer:
+            agg_df.to_excel(writer, sheet_name='aggregated_data', index=False)
+            params_df.to_excel(writer, sheet_name='parameters', index=False)
+            if timings is not None:
+                timings_frame(timings).to_excel(writer, sheet_name='timings', index=False)
+
+    atomic_write(agg_path, write)
+    return agg_path
+
+
+def journal_path(agg_path: str) -> str:
+    return os.path.splitext(agg_path)[0] + '.journal.jsonl'
+
+
+def timings_path(agg_path: str) -> str:
+    return os.path.splitext(agg_path)[0] + '.timings.json'
+
+
+def profile_path(agg_path: str) -> str:
+    """Default location of the cProfile dump of a run."""
+    return os.path.splitext(agg_path)[0] + '.pstats'
+
+
+def manifest_path(output_dir: str) -> str:
+    return os.path.join(output_dir, 'manifest.json')
+
+
+def event_store_path(output_dir: str) -> str:
+    return os.path.join(output_dir, 'events.sqlite')
+
+
+def vocabulary_scan_path(output_dir: str) -> str:
+    return os.path.join(output_dir, 'vocabulary_scan.json')
+
+
+def resumable_files(config: ExtractionConfig, output_dir: str | None = None) -> int:
+    """Number of files an interrupted run with this configuration already finished."""
+    agg_path = aggregated_file_path(config, output_dir or config.output_dir)
+    return len(RunJournal(journal_path(agg_path), config.fingerprint()).load())
+
+
+def run_extraction(config: ExtractionConfig, catalog_df: pd.DataFrame | None = None,
+                   output_dir: str | None = None, progress=None, workers: int = 1,
+                   resume: bool = True, incremental: bool = False,
+                   vocabulary: BatchVocabulary | None = None, profile: str | None = None,
+                   cancel: threading.Event | None = None) -> str:
+    """Process every catalog file of the configured experiment type.
+
+    With ``workers`` > 1 the files are spread over a process pool; rows of the
+    aggregated file stay in catalog order either way. ``progress`` is called
+    as progress(index, total, filename) once per file (before it starts when
+    sequential, as it completes when parallel).
+
+    Each finished file is recorded in a run journal; with ``resume`` a run
+    interrupted earlier with the same configuration skips the files the
+    journal already holds.
+
+    Every processed session is also recorded in the processed-data manifest.
+    With ``incremental`` only new or changed sessions are processed; the rows
+    of the others come from the manifest and everything is merged into the
+    aggregated workbook in catalog order.
+
+    Sequential runs read the next session files on a background thread while
+    the current one is processed, holding at most ``prefetch_mb`` of them.
+
+    Sequential runs encode every session with ``vocabulary`` (a new batch
+    vocabulary if None), so it ends up holding every state and Cat name of the
+    batch; pool workers each keep their own.
+
+    The header/parse/extract/write/aggregate time and the row counts of every
+    processed file go to the 'timings' sheet and to a .timings.json file next
+    to the aggregated workbook. With ``profile`` set to a path, the whole run
+    is profiled with cProfile and the pstats dump is written there.
+
+    Setting ``cancel`` (e.g. from another thread) stops the run once the
+    files in progress are finished. The rows gathered so far are written to
+    a _partial aggregated workbook (files not reached have status
+    'cancelled') and the journal is kept, so the next run resumes. Returns
+    the path of the aggregated workbook, partial or not.
+    """
+    return run_profiles([config], catalog_df=catalog_df, output_dir=output_dir, progress=progress,
+                        workers=workers, resume=resume, incremental=incremental,
+                        vocabulary=vocabulary, profile=profile, cancel=cancel)[0]
+
+
+def run_profiles(configs: list[ExtractionConfig], catalog_df: pd.DataFrame | None = None,
+                 output_dir: str | None = None, progress=None, workers: int = 1,
+                 resume: bool = True, incremental: bool = False,
+                 vocabulary: BatchVocabulary | None = None, profile: str | None = None,
+                 cancel: threading.Event | None = None) -> list[str]:
+    """Run several extraction profiles over one catalog in a single pass.
+
+    Each profile is a configuration bound to its own experiment type. Every
+    CSV is read and parsed once and handed to all the profiles that include
+    it; each profile gets its own aggregated workbook, journal and manifest
+    entries exactly as if it had been run alone by run_extraction. The run
+    settings (parse cache, mmap, prefetch, event store) of the first profile apply to all. ``progress``
+    counts distinct files; ``vocabulary``, timings, ``profile`` and ``cancel``
+    are as for run_extraction (pool workers are not profiled). Returns the
+    aggregated workbook paths, in profile order.
+    """
+    if profile:
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(_run_profiles, configs, catalog_df, output_dir, progress,
+                                    workers, resume, incremental, vocabulary, cancel)
+        finally:
+            atomic_write(profile, profiler.dump_stats)
+    return _run_profiles(configs, catalog_df, output_dir, progress, workers, resume, incremental,
+                         vocabulary, cancel)
+
+
+def _run_profiles(configs, catalog_df, output_dir, progress, workers, resume, incremental,
+                  vocabulary, cancel) -> list[str]:
+    started = time.time()
+    if not configs:
+        raise ValueError("No extraction profile to run")
+    if vocabulary is None:
+        vocabulary = BatchVocabulary()
+    for config in configs:
+        config.validate()
+
+    first = configs[0]
+    for config in configs[1:]:
+        if (os.path.abspath(config.catalog_path) != os.path.abspath(first.catalog_path)
+                or config.sheet_name != first.sheet_name):
+            raise ValueError("All profiles of a run must use the same catalog file and sheet")
+
+    if catalog_df is None:
+        catalog_df = read_catalog(first)
+
+    # Create output directory
+    output_dir = output_dir or first.output_dir
+    os.makedirs(output_dir, exist_ok=True)
+
+    agg_paths = [aggregated_file_path(config, output_dir) for config in configs]
+    if len(set(agg_paths)) < len(agg_paths):
+        raise ValueError("Two profiles would write the same aggregated file "
+                         "(same catalog, sheet and experiment type)")
+
+    file_lists = []
+    for config in configs:
+        file_list = catalog_file_list(catalog_df, config.filename_column,
+                                      config.exptype_column, config.exptype)
+        if not file_list:
+            if len(configs) == 1:
+                raise ValueError("No files found matching the selected experiment type")
+            raise ValueError(f"No files found matching the experiment type '{config.exptype}'")
+        file_lists.append(file_list)
+
+    # Every catalog name is resolved from one listing of the CSV folders
+    resolver = CsvResolver(first.catalog_dir)
+    csv_paths = {filename: resolver.resolve(filename) for filename in set().union(*file_lists)}
+
+    # Sessions listed by several profiles get one output per profile
+    listings = Counter(f for file_list in file_lists for f in set(file_list))
+    shared = {f for f, profiles in listings.items() if profiles > 1}
+
+    config_hashes = [config.fingerprint() for config in configs]
+    journals = [RunJournal(journal_path(agg_path), config_hash)
+                for agg_path, config_hash in zip(agg_paths, config_hashes)]
+    manifest = ProcessingManifest(manifest_path(output_dir))
+
+    # Rows already known per profile: from an interrupted run, or (incremental)
+    # from the manifest for sessions unchanged since they were processed
+    completed, agg_data = [], []
+    for p, config in enumerate(configs):
+        journal_rows = journals[p].load() if resume else {}
+        wanted = set(file_lists[p])
+        completed.append({f: row for f, row in journal_rows.items() if f in wanted})
+
+        known = dict(completed[p])
+        if incremental:
+            for filename in wanted - known.keys():
+                csv_path = csv_paths[filename]
+                row = manifest.lookup(config_hashes[p], csv_path, output_dir) if csv_path else None
+                if row is not None:
+                    known[filename] = row
+        agg_data.append([known.get(filename) for filename in file_lists[p]])
+
+    # Distinct files still to process -> (profile, row index) slots they fill
+    targets = {}
+    for p, rows in enumerate(agg_data):
+        for idx, row in enumerate(rows):
+            if row is None:
+                targets.setdefault(file_lists[p][idx], []).append((p, idx))
+    todo = list(targets)
+
+    total_files = len(set().union(*file_lists))
+    done = total_files - len(todo)
+
+    def profiles_of(filename):
+        return [configs[p] for p in dict.fromkeys(p for p, _ in targets[filename])]
+
+    timings = [{} for _ in configs]
+
+    def known_fingerprint(filename):
+        csv_path = csv_paths[filename]
+        return manifest.fingerprint(csv_path) if csv_path else None
+
+    def finish(filename, outcome):
+        nonlocal done
+        rows, csv_path, fingerprint, records = outcome
+        row_of = {}
+        for p, row, record in zip(dict.fromkeys(p for p, _ in targets[filename]), rows, records):
+            row_of[p] = row
+            timings[p][filename] = record
+            journals[p].record(filename, row)
+            if fingerprint is not None and row['status'] == 'processed':
+                manifest.update(config_hashes[p], csv_path, fingerprint, row)
+        for p, idx in targets[filename]:
+            agg_data[p][idx] = row_of[p]
+        done += 1
+
+    for p, journal in enumerate(journals):
+        journal.open(completed[p])
+    try:
+        if workers > 1 and len(todo) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+                futures = {pool.submit(process_session, profiles_of(filename), filename,
+                                       csv_paths[filename], output_dir,
+                                       known_fingerprint=known_fingerprint(filename),
+                                       shared=filename in shared): filename
+                           for filename in todo}
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    filename = futures[future]
+                    finish(filename, future.result())
+                    if progress is not None:
+                        progress(done, total_files, filename)
+                    if cancel is not None and cancel.is_set():
+                        # Files already running still finish; the others never start
+                        for pending in futures:
+                            pending.cancel()
+        else:
+            cache = ParseCache(parse_cache_dir(output_dir), first.cache_max_mb) if first.parse_cache else None
+
+            def worth_prefetching(csv_path):
+                # Memory-mapped sessions and parse cache hits never read the whole file
+                return not is_mmap_session(first, csv_path) and not (cache and cache.is_fresh(csv_path))
+
+            budget = int(first.prefetch_mb * 1024 * 1024)
+            ahead = [csv_paths[f] for f in todo] if budget > 0 and len(todo) > 1 else []
+            with SessionPrefetcher(ahead, budget, worth_prefetching) as prefetcher:
+                for index, filename in enumerate(todo):
+                    if cancel is not None and cancel.is_set():
+                        break
+                    if progress is not None:
+                        progress(done + 1, total_files, filename)
+                    data = prefetcher.get(index)     # None if not read ahead
+                    finish(filename, process_session(profiles_of(filename), filename, csv_paths[filename],
+                                                     output_dir, vocabulary, data, known_fingerprint(filename),
+                                                     filename in shared))
+    finally:
+        for journal in journals:
+            journal.close()
+        manifest.save()
+
+    if first.parse_cache:
+        ParseCache(parse_cache_dir(output_dir), first.cache_max_mb).evict()
+
+    cancelled = cancel is not None and cancel.is_set() and any(None in rows for rows in agg_data)
+    written = []
+    for p, (config, rows, journal) in enumerate(zip(configs, agg_data, journals)):
+        # Timing records in catalog order
+        records = [timings[p][f] for f in dict.fromkeys(file_lists[p]) if f in timings[p]]
+        run_status = None
+        if cancelled:
+            finished = sum(row is not None for row in rows)
+            run_status = f"partial: cancelled after {finished} of {len(rows)} files"
+            rows = [row if row is not None else
+                    {'filename': profile_output_name(config, filename, filename in shared), 'status': 'cancelled'}
+                    for filename, row in zip(file_lists[p], rows)]
+        start = time.perf_counter()
+        agg_path = create_aggregated_file(config, rows, output_dir, records, run_status)
+        write_timings_json(timings_path(agg_path), records, {
+            'config': config_hashes[p],
+            'exptype': config.exptype,
+            'workers': workers,
+            'files_in_catalog': len(file_lists[p]),
+            'files_processed': len(records),
+            'aggregated_file_s': time.perf_counter() - start,
+            'wall_s': time.time() - started,
+        })
+        written.append(agg_path)
+        if not cancelled:
+            # The journal is kept after a cancel so the next run resumes
+            journal.remove()
+            partial_path = aggregated_file_path(config, output_dir, partial=True)
+            for stale in (partial_path, timings_path(partial_path)):
+                if os.path.exists(stale):
+                    os.remove(stale)
+    return written
@@ -0,0 +1,187 @@
+"""
+Marker Statistics
+=================
+Reduction of a per-trial table (see trial_segmentation.py) to the aggregated
+row of a session: a configurable set of statistics for every marker and
+reward column, computed for all of them at once on one (trials x markers)
+matrix instead of one filtered pass per marker.
+
+Available statistics (aggregated column = ``<marker>_<statistic>``):
+
+    sum          trials in which the marker occurs
+    count        occurrences of the marker, all of them, not only the first
+    avg_time     mean latency of the first occurrence from trial start (ms)
+    median_time  median latency
+    std_time     standard deviation of the latency (sample, n - 1)
+    min_time     shortest latency
+    max_time     longest latency
+    pNN_time     NN-th percentile of the latency, e.g. p90_time
+
+Latencies only cover the trials in which the marker occurs. As in the
+original two-column output, ``sum``, ``count`` and ``avg_time`` are 0 for a
+marker that never occurs; the other latency statistics are left empty.
+
+The same statistics can be computed per time bin of the session (e.g. every
+5 minutes, by trial start time) with summarize_bins: one integer division
+bins every trial, and each bin is a row slice of the same matrices.
+
+Requirements:  pip install pandas numpy
+"""
+
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_STATISTICS = ['sum', 'avg_time']
+
+STATISTICS = ['sum', 'count', 'avg_time', 'median_time', 'std_time', 'min_time', 'max_time', 'pNN_time']
+
+_PERCENTILE = re.compile(r'p(\d{1,2}|100)_time')
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Statistic names
+# ──────────────────────────────────────────────────────────────────────────────
+
+def is_statistic(name: str) -> bool:
+    return (name in STATISTICS and name != 'pNN_time') or _PERCENTILE.fullmatch(name) is not None
+
+
+def parse_statistics(text: str) -> list[str]:
+    """Statistic names from a comma-separated list (as in the parameters sheet).
+
+    Raises ValueError naming the first unknown statistic. An empty text gives
+    the defaults.
+    """
+    names = [name.strip() for name in text.split(',') if name.strip()]
+    for name in names:
+        if not is_statistic(name):
+            raise ValueError(f"Unknown statistic '{name}' (choose from {', '.join(STATISTICS)})")
+    return list(dict.fromkeys(names)) or list(DEFAULT_STATISTICS)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Aggregation
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _latency_statistic(name: str, times: np.ndarray) -> np.ndarray:
+    """One latency statistic per column of ``times`` (NaN where absent)."""
+    if len(times) == 0:
+        return np.full(times.shape[1], 0.0 if name == 'avg_time' else np.nan)
+    with warnings.catch_warnings():
+        # Columns of markers that never occur are all NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        if name == 'avg_time':
+            return np.nan_to_num(np.nanmean(times, axis=0), nan=0.0)
+        if name == 'median_time':
+            return np.nanmedian(times, axis=0)
+        if name == 'std_time':
+            return np.nanstd(times, axis=0, ddof=1)
+        if name == 'min_time':
+            return np.nanmin(times, axis=0)
+        if name == 'max_time':
+            return np.nanmax(times, axis=0)
+        percentile = int(_PERCENTILE.fullmatch(name).group(1))
+        return np.nanpercentile(times, percentile, axis=0)
+
+
+def _marker_matrices(trials_df: pd.DataFrame,
+                     prefixes: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(present, latency, count) matrices of shape (trials, prefixes).
+
+    Each prefix names the ``<prefix>_present`` / ``_time_ms`` / ``_count``
+    columns of the trial table; a prefix without them counts as never
+    occurring. Latencies are NaN where the marker is absent.
+    """
+    available = [p for p in prefixes if f'{p}_present' in trials_df.columns]
+    n_trials = len(trials_df) if available else 0
+
+    present = np.zeros((n_trials, len(prefixes)), dtype=bool)
+    times = np.full((n_trials, len(prefixes)), np.nan)
+    counts = np.zeros((n_trials, len(prefixes)), dtype=np.int64)
+    if available:
+        columns = [prefixes.index(p) for p in available]
+        present[:, columns] = trials_df[[f'{p}_present' for p in available]].to_numpy() == 1
+        times[:, columns] = trials_df[[f'{p}_time_ms' for p in available]].to_numpy(dtype=float)
+        times[~present] = np.nan
+        counted = [p for p in available if f'{p}_count' in trials_df.columns]
+        if counted:
+            counts[:, [prefixes.index(p) for p in counted]] = \
+                trials_df[[f'{p}_count' for p in counted]].to_numpy()
+        # Trial tables written before occurrence counts existed: count first occurrences
+        uncounted = [prefixes.index(p) for p in available if p not in counted]
+        counts[:, uncounted] = present[:, uncounted]
+    return present, times, counts
+
+
+def _reduce(present: np.ndarray, times: np.ndarray, counts: np.ndarray,
+            statistics: list[str]) -> dict:
+    """Statistic name -> one value per prefix column."""
+    values = {}
+    for name in statistics:
+        if name == 'sum':
+            values[name] = present.sum(axis=0)
+        elif name == 'count':
+            values[name] = counts.sum(axis=0)
+        else:
+            values[name] = _latency_statistic(name, times)
+    return values
+
+
+def summarize_markers(trials_df: pd.DataFrame, prefixes: list[str],
+                      statistics: list[str] = DEFAULT_STATISTICS) -> dict:
+    """Aggregated columns of every marker prefix, in prefix then statistic order."""
+    prefixes = list(dict.fromkeys(prefixes))
+    values = _reduce(*_marker_matrices(trials_df, prefixes), statistics)
+    result = {}
+    for k, prefix in enumerate(prefixes):
+        for name in statistics:
+            result[f'{prefix}_{name}'] = values[name][k]
+    return result
+
+
+def summarize_bins(trials_df: pd.DataFrame, prefixes: list[str], statistics: list[str],
+                   bin_minutes: float, session_end_ms: float) -> pd.DataFrame:
+    """Long-format table of the marker statistics per time bin of a session.
+
+    Trials go to the bin of their start time; bins run from time 0 to the
+    last event of the session, so bins without trials are listed too.
+    Columns: bin (from 1), start_min, end_min, trials, then
+    ``<prefix>_<statistic>`` as in summarize_markers.
+    """
+    prefixes = list(dict.fromkeys(prefixes))
+    present, times, counts = _marker_matrices(trials_df, prefixes)
+    bin_ms = bin_minutes * 60_000
+    start_times = (trials_df['trial_start_time_ms'].to_numpy() if len(present)
+                   else np.empty(0, dtype=np.int64))
+
+    # Trials are in time order, so every bin is a contiguous slice of rows
+    trial_bins = (start_times // bin_ms).astype(np.int64)
+    n_bins = int(max(session_end_ms // bin_ms, trial_bins.max(initial=0))) + 1
+    bounds = np.searchsorted(trial_bins, np.arange(n_bins + 1), side='left')
+
+    table = {
+        'bin': np.arange(1, n_bins + 1),
+        'start_min': np.arange(n_bins) * bin_minutes,
+        'end_min': np.arange(1, n_bins + 1) * bin_minutes,
+        'trials': np.diff(bounds),
+    }
+    per_bin = [_reduce(present[lo:hi], times[lo:hi], counts[lo:hi], statistics)
+               for lo, hi in zip(bounds[:-1], bounds[1:])]
+    for k, prefix in enumerate(prefixes):
+        for name in statistics:
+            table[f'{prefix}_{name}'] = [values[name][k] for values in per_bin]
+    return pd.DataFrame(table)
+
+
+def binned_columns(bins_df: pd.DataFrame) -> dict:
+    """Aggregated columns of a bins table: each value suffixed with its bin, ``_bin<N>``."""
+    value_columns = [c for c in bins_df.columns if c not in ('bin', 'start_min', 'end_min')]
+    result = {}
+    for row in bins_df.to_dict('records'):
+        for column in value_columns:
+            result[f"{column}_bin{row['bin']}"] = row[column]
+    return result
@@ -0,0 +1,87 @@
+"""
+Output Fingerprints
+===================
+Skip rewriting per-session outputs that would come out identical.
+
+Every output file is written to a hidden temporary file next to it and
+renamed over the target once complete, so an interrupted run never leaves a
+truncated workbook behind. Once all outputs of a session are written, a
+sidecar next to them records their fingerprint:
+
+    processed_data/.<main output name>.fingerprint.json
+        {"version": 1, "fingerprint": "...", "files": ["<name>.xlsx", ...]}
+
+The fingerprint covers the content hash of the source CSV, the extraction
+parameters and OUTPUT_VERSION. A later run computing the same fingerprint,
+with every listed file still present, leaves the files untouched (same
+bytes, same mtime), so backup and sync tools see no change.
+
+Requirements:  none beyond the standard library
+"""
+
+import hashlib
+import json
+import os
+
+
+# Bump whenever the content of the per-session outputs changes, so existing ones are rewritten
+OUTPUT_VERSION = 2
+
+
+def atomic_write(path: str, write):
+    """Call write(tmp_path), then rename the temporary file over ``path``.
+
+    The temporary file is hidden and keeps the extension of ``path`` (the
+    Excel writers pick their format from it). Every file of processed_data/
+    is written through here (per-session outputs and sidecars, aggregated
+    workbooks, timings, manifest and caches) except the run journal, which
+    is appended to line by line, and the SQLite event store.
+    """
+    folder, name = os.path.split(path)
+    tmp_path = os.path.join(folder, f".{os.getpid()}.{name}")
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def output_fingerprint(source_hash: str, parameters_fingerprint: str) -> str:
+    """Fingerprint of a session's outputs: source content, extraction parameters, output version."""
+    text = json.dumps([OUTPUT_VERSION, source_hash, parameters_fingerprint])
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def fingerprint_path(output_dir: str, output_filename: str) -> str:
+    return os.path.join(output_dir, f".{output_filename}.fingerprint.json")
+
+
+def outputs_current(output_dir: str, output_filename: str, fingerprint: str) -> bool:
+    """Whether the outputs recorded for a session match ``fingerprint`` and all still exist."""
+    try:
+        with open(fingerprint_path(output_dir, output_filename), 'r', encoding='utf-8') as f:
+            recorded = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (recorded.get('version') == OUTPUT_VERSION
+            and recorded.get('fingerprint') == fingerprint
+            and all(os.path.exists(os.path.join(output_dir, name)) for name in recorded.get('files', [])))
+
+
+def forget_outputs(output_dir: str, output_filename: str):
+    """Drop the sidecar of a session before its outputs are rewritten."""
+    path = fingerprint_path(output_dir, output_filename)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def record_outputs(output_dir: str, output_filename: str, fingerprint: str, files: list[str]):
+    """Record the fingerprint of a session's freshly written outputs (paths relative to output_dir)."""
+    content = {'version': OUTPUT_VERSION, 'fingerprint': fingerprint, 'files': files}
+
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(content, f)
+
+    atomic_write(fingerprint_path(output_dir, output_filename), write)
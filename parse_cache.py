@@ -0,0 +1,201 @@
+"""
+Parse Cache
+===========
+On-disk cache of parsed session CSVs, so re-running an extraction after a
+configuration tweak loads pre-parsed typed columns instead of re-parsing
+every file from text.
+
+Layout (inside processed_data/.parse_cache/):
+    <content hash>.v<N>.npz   typed columns + header of one parsed session
+    <path key>.json           last seen size/mtime/content hash of one source
+
+A source whose size and mtime are unchanged is served straight from its
+entry. Otherwise the file is re-read and hashed: an identical content hash
+reuses the entry, anything else is parsed again. The cache is trimmed to a
+maximum total size, least recently used entries first, by evict() (called
+once at the end of a run rather than after every store).
+
+Requirements:  pip install pandas numpy
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from output_fingerprint import atomic_write
+from session_parser import EVENT_COLUMNS, parse_events, parse_header, read_session_bytes
+
+
+CACHE_VERSION = 1            # bump whenever the parsed layout changes
+DEFAULT_MAX_MB = 2048
+_HASH_BLOCK = 1 << 20
+
+_CATEGORICAL = ['Cat', 'state', 'Display']
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Fingerprints
+# ──────────────────────────────────────────────────────────────────────────────
+
+def content_hash(data: bytes | memoryview) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_fingerprint(path: str, data: bytes | memoryview | None = None) -> dict:
+    """Size, mtime and content hash of a file (``data``, its bytes or a view of them, avoids a re-read).
+
+    Without ``data`` the file is hashed block by block, never held in memory.
+    """
+    stat = os.stat(path)
+    if data is not None:
+        digest = content_hash(data)
+    else:
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK), b''):
+                hasher.update(block)
+        digest = hasher.hexdigest()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': digest}
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Cache
+# ──────────────────────────────────────────────────────────────────────────────
+
+class ParseCache:
+    """Parsed-session cache rooted at ``cache_dir``."""
+
+    def __init__(self, cache_dir: str, max_mb: float = DEFAULT_MAX_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, f"{digest}.v{CACHE_VERSION}.npz")
+
+    def _source_path(self, csv_path: str) -> str:
+        key = hashlib.blake2b(os.path.abspath(csv_path).encode('utf-8'), digest_size=12).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    # ── Lookup ────────────────────────────────────────────────────────────────
+    def is_fresh(self, csv_path: str) -> bool:
+        """True if load() will serve ``csv_path`` without reading the file."""
+        stat = os.stat(csv_path)
+        source = self._read_source(self._source_path(csv_path))
+        return bool(source and source['size'] == stat.st_size
+                    and source['mtime_ns'] == stat.st_mtime_ns
+                    and os.path.exists(self._entry_path(source['hash'])))
+
+    def fingerprint(self, csv_path: str) -> dict | None:
+        """Recorded size/mtime/hash of ``csv_path`` if its size and mtime still match (no read)."""
+        stat = os.stat(csv_path)
+        source = self._read_source(self._source_path(csv_path))
+        if source and source['size'] == stat.st_size and source['mtime_ns'] == stat.st_mtime_ns:
+            return {'size': source['size'], 'mtime_ns': source['mtime_ns'], 'hash': source['hash']}
+        return None
+
+    def load(self, csv_path: str, data: bytes | None = None) -> tuple[list[str], pd.DataFrame]:
+        """Header lines and typed events of a session, parsed at most once.
+
+        ``data`` may hold the file bytes if they were already read.
+        """
+        stat = os.stat(csv_path)
+        source_path = self._source_path(csv_path)
+        source = self._read_source(source_path)
+
+        if (source and source['size'] == stat.st_size
+                and source['mtime_ns'] == stat.st_mtime_ns):
+            cached = self._read_entry(source['hash'])
+            if cached is not None:
+                return cached
+
+        if data is None:
+            data = read_session_bytes(csv_path)
+        digest = content_hash(data)
+        source = {'path': os.path.abspath(csv_path), 'size': stat.st_size,
+                  'mtime_ns': stat.st_mtime_ns, 'hash': digest}
+        atomic_write(source_path, lambda p: self._write_json(p, source))
+
+        cached = self._read_entry(digest)
+        if cached is not None:
+            return cached
+
+        header_lines, df = parse_header(data), parse_events(data)
+        self._write_entry(digest, header_lines, df)
+        return header_lines, df
+
+    @staticmethod
+    def _read_source(source_path: str) -> dict | None:
+        try:
+            with open(source_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_json(path: str, content: dict):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(content, f)
+
+    # ── Entries ───────────────────────────────────────────────────────────────
+    def _read_entry(self, digest: str) -> tuple[list[str], pd.DataFrame] | None:
+        entry_path = self._entry_path(digest)
+        try:
+            with np.load(entry_path, allow_pickle=False) as npz:
+                columns = {}
+                for col in EVENT_COLUMNS:
+                    if col in _CATEGORICAL:
+                        columns[col] = pd.Categorical.from_codes(
+                            npz[f'{col}_codes'], categories=npz[f'{col}_categories'].tolist())
+                    elif col == 'Num_cat':
+                        columns[col] = pd.arrays.IntegerArray(npz['Num_cat'], npz['Num_cat_mask'])
+                    else:
+                        columns[col] = npz[col]
+                header_lines = npz['header'].tolist()
+        except (OSError, KeyError, ValueError):
+            return None
+
+        # Touch the entry so eviction sees it as recently used
+        os.utime(entry_path)
+        return header_lines, pd.DataFrame(columns, columns=EVENT_COLUMNS)
+
+    def _write_entry(self, digest: str, header_lines: list[str], df: pd.DataFrame):
+        arrays = {'header': np.array(header_lines, dtype=str)}
+        for col in EVENT_COLUMNS:
+            if col in _CATEGORICAL:
+                arrays[f'{col}_codes'] = df[col].cat.codes.to_numpy()
+                arrays[f'{col}_categories'] = np.array(df[col].cat.categories.tolist(), dtype=str)
+            elif col == 'Num_cat':
+                arrays['Num_cat'] = df[col].to_numpy(dtype=np.int64, na_value=0)
+                arrays['Num_cat_mask'] = df[col].isna().to_numpy()
+            else:
+                arrays[col] = df[col].to_numpy()
+
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+
+        atomic_write(self._entry_path(digest), write)
+
+    # ── Eviction ──────────────────────────────────────────────────────────────
+    def evict(self):
+        """Delete least recently used entries until the cache fits max_bytes."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            # Hidden names are entries still being written (atomic_write)
+            if entry.name.endswith('.npz') and not entry.name.startswith('.'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,84 @@
+"""
+Processing Manifest
+===================
+Record of what processed_data/ already holds, kept in
+processed_data/manifest.json:
+
+    {"version": 1,
+     "configs": {"<config fingerprint>": {
+         "<source CSV path>": {"size": ..., "mtime_ns": ..., "hash": "...",
+                               "row": {<aggregated row>}}}}}
+
+An incremental run looks every session up here: when the source CSV still
+has the same fingerprint (size and mtime, or else content hash) under the
+same extraction configuration, and its output still exists, the recorded
+aggregated row is reused and the file is not processed again.
+"""
+
+import json
+import os
+
+from output_fingerprint import atomic_write
+from parse_cache import file_fingerprint
+from run_journal import json_default
+
+
+MANIFEST_VERSION = 1
+
+
+class ProcessingManifest:
+    """Source fingerprint -> aggregated row, per extraction configuration."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.configs = {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+            if content.get('version') == MANIFEST_VERSION:
+                self.configs = content.get('configs', {})
+        except (OSError, ValueError):
+            pass
+
+    def lookup(self, config_hash: str, csv_path: str, output_dir: str) -> dict | None:
+        """Recorded row of an unchanged, already processed session (else None)."""
+        entry = self.configs.get(config_hash, {}).get(os.path.abspath(csv_path))
+        if entry is None:
+            return None
+        if not os.path.exists(os.path.join(output_dir, entry['row']['filename'])):
+            return None
+
+        stat = os.stat(csv_path)
+        if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['row']
+
+        # Touched or copied: only the content decides
+        fingerprint = file_fingerprint(csv_path)
+        if fingerprint['hash'] != entry['hash']:
+            return None
+        entry.update(fingerprint)
+        return entry['row']
+
+    def fingerprint(self, csv_path: str) -> dict | None:
+        """Recorded size/mtime/hash of an unchanged ``csv_path``, under any configuration (no read)."""
+        path = os.path.abspath(csv_path)
+        try:
+            stat = os.stat(csv_path)
+        except OSError:
+            return None
+        for entries in self.configs.values():
+            entry = entries.get(path)
+            if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+                return {'size': entry['size'], 'mtime_ns': entry['mtime_ns'], 'hash': entry['hash']}
+        return None
+
+    def update(self, config_hash: str, csv_path: str, fingerprint: dict, row: dict):
+        self.configs.setdefault(config_hash, {})[os.path.abspath(csv_path)] = {**fingerprint, 'row': row}
+
+    def save(self):
+        def write(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': MANIFEST_VERSION, 'configs': self.configs}, f,
+                          default=json_default)
+
+        atomic_write(self.path, write)
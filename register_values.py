@@ -0,0 +1,103 @@
+"""
+Register Values
+===============
+Values of the running registers a session writes to its event stream:
+``Reg`` rows (Accuracy, Omission, ComptNbessai, ComptIncR, HoleNumber...) and
+``List`` rows (Pseudo1a5...), whose ``state`` is the register name and whose
+``value`` is the number parsed from its decimal comma (``97,826`` -> 97.826)
+by session_parser.
+
+A register keeps its value until it is written again, so its value at any
+row is the last value written at or before that row: one binary search per
+register over the rows that write it answers every trial at once. A write
+without a number (``NaN``, as after a stage change resets the registers)
+leaves the register NaN until its next write.
+
+    trial table        reg_<name>        value at the last row of the trial
+    aggregated_data    reg_<name>_last   last value written in the session
+
+Registers are selected by name, or all of them with 'all' (the registers
+written in each session, sorted by name).
+
+Requirements:  pip install pandas numpy
+"""
+
+import numpy as np
+import pandas as pd
+
+
+REGISTER_CATS = ['Reg', 'List']
+ALL_REGISTERS = 'all'
+
+
+def parse_registers(text: str) -> list[str]:
+    """Register names from a comma-separated list (as in the parameters sheet).
+
+    'all' anywhere in the list selects every register; an empty text none.
+    """
+    names = [name.strip() for name in text.split(',') if name.strip()]
+    if any(name.lower() == ALL_REGISTERS for name in names):
+        return [ALL_REGISTERS]
+    return list(dict.fromkeys(names))
+
+
+def _register_writes(df: pd.DataFrame) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """Register name -> (rows, values) of every write of it, rows ascending.
+
+    Rows without a register name are ignored.
+    """
+    values = df['value'].to_numpy(dtype=float)
+    # A write without a number (e.g. 'NaN' after a stage reset) sets the register to NaN
+    rows = np.flatnonzero(df['Cat'].isin(REGISTER_CATS).to_numpy())
+    if len(rows) == 0:
+        return {}
+    codes, names = pd.factorize(df['state'].to_numpy()[rows])
+
+    # Group the writes by register; the stable sort keeps them in row order
+    order = np.argsort(codes, kind='stable')
+    rows = rows[order]
+    bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+    return {str(name): (rows[lo:hi], values[rows[lo:hi]])
+            for name, lo, hi in zip(names, bounds[:-1], bounds[1:])}
+
+
+def _selected(writes: dict, registers: list[str]) -> list[str]:
+    if registers == [ALL_REGISTERS]:
+        return sorted(writes)
+    return registers
+
+
+def register_values_at(df: pd.DataFrame, positions: np.ndarray,
+                       registers: list[str]) -> dict[str, np.ndarray]:
+    """Value of each register at the given row positions (NaN before its first write).
+
+    A register never written in the session is all NaN; one last written
+    without a number is NaN too.
+    """
+    writes = _register_writes(df)
+    result = {}
+    for name in _selected(writes, registers):
+        if name not in writes:
+            result[name] = np.full(len(positions), np.nan)
+            continue
+        rows, values = writes[name]
+        last_write = np.searchsorted(rows, positions, side='right') - 1
+        result[name] = np.where(last_write >= 0, values[np.maximum(last_write, 0)], np.nan)
+    return result
+
+
+def add_trial_registers(trials_df: pd.DataFrame, df: pd.DataFrame,
+                        registers: list[str]) -> pd.DataFrame:
+    """Trial table with a ``reg_<name>`` column per register: its value at the end of the trial."""
+    if trials_df.empty or not registers:
+        return trials_df
+    values = register_values_at(df, trials_df['stop_line'].to_numpy(), registers)
+    return trials_df.assign(**{f'reg_{name}': column for name, column in values.items()})
+
+
+def last_register_values(df: pd.DataFrame, registers: list[str]) -> dict:
+    """Aggregated ``reg_<name>_last`` columns: the last value of each register in the session."""
+    if not registers:
+        return {}
+    values = register_values_at(df, np.array([len(df) - 1]), registers)
+    return {f'reg_{name}_last': column[0] for name, column in values.items()}
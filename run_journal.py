@@ -0,0 +1,83 @@
+"""
+Run Journal
+===========
+Append-only record of the files an extraction run has finished, kept in
+processed_data/ next to the aggregated workbook it will produce:
+
+    <aggregated name>.journal.jsonl
+        {"config": "<config fingerprint>"}           first line
+        {"filename": "...", "row": {...}}            one line per finished file
+
+Every line is flushed to disk as soon as the file is done, so a crash or a
+closed window loses at most the file in progress. A restarted run with the
+same configuration reads the journal back and skips the files already
+processed. The journal is removed once the aggregated workbook is written.
+"""
+
+import json
+import os
+
+
+def json_default(value):
+    """JSON encoder fallback for the values found in aggregated rows."""
+    # numpy scalars (sums, means) -> plain Python numbers
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+class RunJournal:
+    """Journal of one extraction run, identified by a configuration fingerprint."""
+
+    def __init__(self, path: str, config_hash: str):
+        self.path = path
+        self.config_hash = config_hash
+        self._file = None
+
+    def load(self) -> dict:
+        """Aggregated rows of the files this configuration already processed.
+
+        A journal written for another configuration is ignored. Rows with an
+        error status are left out so those files are retried.
+        """
+        rows = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline() or '{}')
+                if header.get('config') != self.config_hash:
+                    return {}
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break   # torn last line of an interrupted write
+                    if entry['row'].get('status') == 'processed':
+                        rows[entry['filename']] = entry['row']
+        except (OSError, ValueError):
+            return {}
+        return rows
+
+    def open(self, completed: dict):
+        """Start (or restart) the journal, keeping the ``completed`` rows."""
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write({'config': self.config_hash})
+        for filename, row in completed.items():
+            self._write({'filename': filename, 'row': row})
+
+    def record(self, filename: str, row: dict):
+        self._write({'filename': filename, 'row': row})
+
+    def _write(self, entry: dict):
+        self._file.write(json.dumps(entry, default=json_default) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
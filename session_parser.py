@@ -0,0 +1,375 @@
+"""
+Session Parser
+==============
+Purpose-built reader for the behavior-system CSV layout:
+
+    11 header lines (Subject, Protocol, Date, ... then Start and Ready rows)
+    Num_line, S, MS, Cat, Num_cat, state, Display[, decimals]
+
+Register rows (Reg/List) write their value with a French decimal comma, e.g.
+``38,135,255,Reg,13,Accuracy,   97,826,`` so the number is split over the
+Display field and the one after it. The parser works directly on the file
+bytes with NumPy: line and field boundaries come from one scan for newlines
+and commas, and every column is decoded in a single vectorized pass into
+typed arrays, including the absolute time in milliseconds and the rebuilt
+register value.
+
+Very long sessions are read with SessionReader instead: the file is memory-
+mapped, a line-offset index is built once, and only the requested columns
+are decoded, a block of lines at a time, so memory use does not grow with
+the size of the file beyond the decoded columns themselves.
+
+Requirements:  pip install pandas numpy
+"""
+
+import mmap
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+HEADER_LINES = 11
+ENCODING = 'latin-1'
+
+EVENT_COLUMNS = ['Num_line', 'S', 'MS', 'time_ms', 'Cat', 'Num_cat', 'state', 'Display', 'value']
+
+_FIELDS = 8          # Num_line .. Display plus the decimals of a register value
+_SCAN_BYTES = 1 << 24     # SessionReader: bytes scanned per block for the line index
+_CHUNK_LINES = 1 << 18    # SessionReader: lines decoded per block
+_COMMA, _NEWLINE, _CR = ord(','), ord('\n'), ord('\r')
+_SPACE, _MINUS, _ZERO, _NINE = ord(' '), ord('-'), ord('0'), ord('9')
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Byte-level helpers
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _line_bounds(buf: np.ndarray, skip: int,
+                 newlines: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """Start/end offsets of every non-empty line after the first ``skip`` lines.
+
+    ``newlines`` may hold the offsets of the newline bytes if already known.
+    """
+    if newlines is None:
+        newlines = np.flatnonzero(buf == _NEWLINE)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(buf)]))
+    starts, ends = starts[skip:], ends[skip:]
+
+    # Strip the '\r' of Windows line endings
+    has_cr = ends > starts
+    has_cr[has_cr] = buf[ends[has_cr] - 1] == _CR
+    ends = ends - has_cr
+
+    non_empty = ends > starts
+    return starts[non_empty], ends[non_empty]
+
+
+def _field_bounds(buf: np.ndarray, line_starts: np.ndarray,
+                  line_ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(n_lines, _FIELDS) start/end offsets of each comma-separated field.
+
+    Fields missing from a short line get an empty span.
+    """
+    commas = np.flatnonzero(buf == _COMMA)
+    first = np.searchsorted(commas, line_starts)
+    n_commas = np.searchsorted(commas, line_ends) - first
+
+    starts = np.empty((len(line_starts), _FIELDS), dtype=np.int64)
+    ends = np.empty_like(starts)
+    starts[:, 0] = line_starts
+    for k in range(_FIELDS):
+        has_comma = k < n_commas
+        comma_pos = commas.take(first + k, mode='clip') if len(commas) else line_ends
+        ends[:, k] = np.where(has_comma, comma_pos, line_ends)
+        if k + 1 < _FIELDS:
+            starts[:, k + 1] = np.where(has_comma, comma_pos + 1, line_ends)
+    return starts, ends
+
+
+def _field_chars(buf: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+    """Yield (j, chars, inside): the j-th byte of every field, column by column.
+
+    ``inside`` is False for fields shorter than j + 1 bytes; their ``chars``
+    entry is meaningless.
+    """
+    widths = ends - starts
+    width = int(widths.max()) if len(widths) else 0
+    idx = starts.copy()
+    chars = np.empty(len(starts), dtype=np.uint8)
+    inside = np.empty(len(starts), dtype=bool)
+    for j in range(width):
+        buf.take(idx, mode='clip', out=chars)
+        np.greater(widths, j, out=inside)
+        yield j, chars, inside
+        idx += 1
+
+
+def parse_int_field(buf: np.ndarray, starts: np.ndarray,
+                    ends: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Decode integer fields, tolerating surrounding spaces and a leading '-'.
+
+    Returns (values, valid, n_digits, negative); ``valid`` is False for empty
+    or non-numeric fields.
+    """
+    n = len(starts)
+    values = np.zeros(n, dtype=np.int64)
+    n_digits = np.zeros(n, dtype=np.int64)
+    n_minus = np.zeros(n, dtype=np.int64)
+    bad = np.zeros(n, dtype=bool)
+    for _, chars, inside in _field_chars(buf, starts, ends):
+        digit = chars - np.uint8(_ZERO)
+        is_digit = (digit < 10) & inside
+        is_minus = (chars == _MINUS) & inside
+        bad |= inside & ~is_digit & ~is_minus & (chars != _SPACE)
+        values *= np.where(is_digit, 10, 1)
+        values += np.where(is_digit, digit, 0)
+        n_digits += is_digit
+        n_minus += is_minus
+
+    valid = ~bad & (n_digits > 0) & (n_minus <= 1)
+    negative = (n_minus > 0) & valid
+    values[negative] *= -1
+    values[~valid] = 0
+    return values, valid, n_digits, negative
+
+
+def parse_text_field(buf: np.ndarray, starts: np.ndarray,
+                     ends: np.ndarray) -> pd.Categorical:
+    """Decode text fields into a Categorical (empty fields become NaN).
+
+    Each field is reduced to a 64-bit polynomial hash of its bytes and the
+    hashes are factorized; only one representative per distinct value is
+    decoded to text.
+    """
+    hashes = np.zeros(len(starts), dtype=np.uint64)
+    for _, chars, inside in _field_chars(buf, starts, ends):
+        hashes = np.where(inside, hashes * np.uint64(1099511628211) + chars + np.uint64(1), hashes)
+    codes, uniques = pd.factorize(hashes)
+
+    # Row of the first occurrence of each distinct value
+    first_row = np.empty(len(uniques), dtype=np.int64)
+    first_row[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+
+    # Fields that only differ by padding share a category; blank fields are missing
+    categories = {}
+    remap = np.empty(len(uniques), dtype=np.int64)
+    for i, row in enumerate(first_row):
+        text = bytes(buf[starts[row]:ends[row]]).decode(ENCODING).strip()
+        remap[i] = categories.setdefault(text, len(categories)) if text else -1
+    return pd.Categorical.from_codes(remap[codes], categories=list(categories))
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Public API
+# ──────────────────────────────────────────────────────────────────────────────
+
+def read_session_bytes(source) -> bytes:
+    """Raw bytes of a session, from a path or an in-memory buffer."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def parse_header(data: bytes) -> list[str]:
+    """First HEADER_LINES lines of a session, decoded."""
+    lines = data.split(b'\n', HEADER_LINES)[:HEADER_LINES]
+    return [line.decode(ENCODING) + '\n' for line in lines]
+
+
+def header_fields(header_lines: list[str]) -> dict[str, str]:
+    """Named header values, e.g. {'Subject': '665', 'Protocol': 'Level_4', ...}.
+
+    Header lines read ``,,<name>,,,<value>,``; a value written with commas
+    (the Time line: ``16:43:58,241``) is kept whole.
+    """
+    fields = {}
+    for line in header_lines:
+        parts = [part.strip() for part in line.strip().split(',')]
+        # Only the ',,<name>' lines; the Start/Ready rows closing the header are events
+        if len(parts) > 2 and not parts[0] and not parts[1] and parts[2]:
+            fields.setdefault(parts[2], ','.join(part for part in parts[3:] if part))
+    return fields
+
+
+def _decode_lines(buf: np.ndarray, line_starts: np.ndarray, line_ends: np.ndarray,
+                  columns: list[str]) -> dict:
+    """Decode the requested event columns of the given lines.
+
+    Lines whose Num_line, S or MS is not a number are not events and are
+    skipped.
+    """
+    starts, ends = _field_bounds(buf, line_starts, line_ends)
+
+    num_line, ok_line, _, _ = parse_int_field(buf, starts[:, 0], ends[:, 0])
+    sec, ok_s, _, _ = parse_int_field(buf, starts[:, 1], ends[:, 1])
+    msec, ok_ms, _, _ = parse_int_field(buf, starts[:, 2], ends[:, 2])
+    events = ok_line & ok_s & ok_ms
+    if not events.all():
+        starts, ends = starts[events], ends[events]
+        num_line, sec, msec = num_line[events], sec[events], msec[events]
+
+    decoded = {}
+    if 'Num_line' in columns:
+        decoded['Num_line'] = num_line
+    if 'S' in columns:
+        decoded['S'] = sec
+    if 'MS' in columns:
+        decoded['MS'] = msec
+    if 'time_ms' in columns:
+        decoded['time_ms'] = sec * 1000 + msec
+    if 'Cat' in columns:
+        decoded['Cat'] = parse_text_field(buf, starts[:, 3], ends[:, 3])
+    if 'Num_cat' in columns:
+        num_cat, ok_num_cat, _, _ = parse_int_field(buf, starts[:, 4], ends[:, 4])
+        decoded['Num_cat'] = pd.arrays.IntegerArray(num_cat, ~ok_num_cat)
+    if 'state' in columns:
+        decoded['state'] = parse_text_field(buf, starts[:, 5], ends[:, 5])
+
+    if 'Display' in columns or 'value' in columns:
+        # Register values: integer part in Display, decimals in the next field.
+        # Only rows with something after Display can hold one.
+        value = np.full(len(starts), np.nan)
+        split = np.flatnonzero(ends[:, 7] > starts[:, 7])
+        int_part, ok_int, _, negative = parse_int_field(buf, starts[split, 6], ends[split, 6])
+        decimals, ok_dec, n_dec, dec_negative = parse_int_field(buf, starts[split, 7], ends[split, 7])
+        is_split_value = ok_int & ok_dec & ~dec_negative
+        fraction = decimals / np.power(10.0, n_dec)
+        value[split[is_split_value]] = (int_part + np.where(negative, -fraction, fraction))[is_split_value]
+
+        is_value = np.zeros(len(starts), dtype=bool)
+        is_value[split[is_split_value]] = True
+        text_rows = np.flatnonzero(~is_value)
+        display_codes = np.full(len(starts), -1, dtype=np.int64)
+        display_text = parse_text_field(buf, starts[text_rows, 6], ends[text_rows, 6])
+        display_codes[text_rows] = display_text.codes
+        if 'Display' in columns:
+            decoded['Display'] = pd.Categorical.from_codes(display_codes, dtype=display_text.dtype)
+        if 'value' in columns:
+            decoded['value'] = value
+
+    return decoded
+
+
+def parse_events(data: bytes) -> pd.DataFrame:
+    """Typed event table of a session (the rows after the header).
+
+    Columns: integer Num_line, S, MS and absolute ``time_ms``; categorical Cat,
+    state and Display; nullable integer Num_cat; and ``value``, the numeric
+    register value of rows written with a decimal comma (NaN elsewhere).
+    Lines whose Num_line, S or MS is not a number are not events and are
+    skipped.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    line_starts, line_ends = _line_bounds(buf, HEADER_LINES)
+    return pd.DataFrame(_decode_lines(buf, line_starts, line_ends, EVENT_COLUMNS),
+                        columns=EVENT_COLUMNS)
+
+
+def read_session(source) -> tuple[list[str], pd.DataFrame]:
+    """Header lines and typed event table of a session path or buffer."""
+    data = read_session_bytes(source)
+    return parse_header(data), parse_events(data)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Memory-mapped reader
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _concat_columns(parts: list):
+    """Join the per-block pieces of one decoded column."""
+    first = parts[0]
+    if len(parts) == 1:
+        return first
+    if isinstance(first, pd.Categorical):
+        return union_categoricals(parts)
+    if isinstance(first, pd.arrays.IntegerArray):
+        return pd.arrays.IntegerArray(np.concatenate([p.to_numpy(dtype=np.int64, na_value=0) for p in parts]),
+                                      np.concatenate([p.isna() for p in parts]))
+    return np.concatenate(parts)
+
+
+class SessionReader:
+    """Memory-mapped session CSV with lazily decoded event columns.
+
+    The line-offset index is built once on opening; each column is decoded on
+    first access, block by block, and kept. Decoded columns are plain NumPy /
+    pandas arrays that stay valid after close(). Use as a context manager::
+
+        with SessionReader(path) as reader:
+            header_lines = reader.header_lines
+            df = reader.to_frame(['time_ms', 'Cat', 'state'])
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._mmap = None       # empty file: nothing to map
+        self._buf = (np.frombuffer(self._mmap, dtype=np.uint8) if self._mmap is not None
+                     else np.empty(0, dtype=np.uint8))
+        self._columns = {}
+
+        # Line-offset index, built from a block-wise newline scan
+        newlines = [np.flatnonzero(self._buf[pos:pos + _SCAN_BYTES] == _NEWLINE) + pos
+                    for pos in range(0, len(self._buf), _SCAN_BYTES)]
+        newlines = np.concatenate(newlines) if newlines else np.empty(0, dtype=np.int64)
+        header_end = newlines[HEADER_LINES - 1] + 1 if len(newlines) >= HEADER_LINES else len(self._buf)
+        self.header_lines = parse_header(bytes(self._buf[:header_end]))
+        self.line_starts, self.line_ends = _line_bounds(self._buf, HEADER_LINES, newlines)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._buf = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    @property
+    def buffer(self) -> memoryview:
+        """The mapped bytes of the whole file (valid until close())."""
+        return memoryview(self._buf)
+
+    def __len__(self) -> int:
+        """Number of data lines (event rows, plus any non-event line)."""
+        return len(self.line_starts)
+
+    def column(self, name: str):
+        """One event column, decoded on first access."""
+        return self.columns([name])[name]
+
+    def columns(self, names: list[str]) -> dict:
+        """Several event columns, decoding the missing ones in one pass."""
+        missing = [name for name in names if name not in self._columns]
+        unknown = set(missing) - set(EVENT_COLUMNS)
+        if unknown:
+            raise KeyError(f"Unknown event column(s): {', '.join(sorted(unknown))}")
+        if missing:
+            parts = {name: [] for name in missing}
+            for lo in range(0, max(len(self), 1), _CHUNK_LINES):
+                hi = min(lo + _CHUNK_LINES, len(self))
+                # Decode the block from a view starting at its first byte
+                offset = self.line_starts[lo] if hi > lo else 0
+                end = self.line_ends[hi - 1] if hi > lo else 0
+                block = _decode_lines(self._buf[offset:end], self.line_starts[lo:hi] - offset,
+                                      self.line_ends[lo:hi] - offset, missing)
+                for name in missing:
+                    parts[name].append(block[name])
+            for name in missing:
+                self._columns[name] = _concat_columns(parts[name])
+        return {name: self._columns[name] for name in names}
+
+    def to_frame(self, columns: list[str] | None = None) -> pd.DataFrame:
+        """Event table with the given columns (all of EVENT_COLUMNS by default)."""
+        columns = [c for c in EVENT_COLUMNS if c in (columns or EVENT_COLUMNS)]
+        return pd.DataFrame(self.columns(columns), columns=columns)
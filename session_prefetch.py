@@ -0,0 +1,88 @@
+"""
+Session Prefetch
+================
+Background reading of the session files a sequential run will process next.
+
+While the current session is parsed and segmented, a thread reads the raw
+bytes of the following ones into memory, so network I/O overlaps with the
+CPU work instead of alternating with it. The buffered bytes never exceed a
+memory budget: the reader waits for the consumer once the budget is used,
+and files larger than the whole budget are left for the consumer to read
+itself. Files are handed out strictly in order.
+
+Requirements:  none (standard library)
+"""
+
+import os
+import threading
+
+from session_parser import read_session_bytes
+
+
+class SessionPrefetcher:
+    """Read ``paths`` ahead of the consumer, within ``budget_bytes``.
+
+    ``paths`` entries may be None (file not present). ``wanted(path)``
+    decides whether a file is worth reading ahead (e.g. not served by the
+    parse cache); get() returns None for the others.
+    """
+
+    def __init__(self, paths: list[str | None], budget_bytes: int, wanted=None):
+        self.paths = paths
+        self.budget_bytes = budget_bytes
+        self.wanted = wanted
+        self._ready = {}
+        self._buffered = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self):
+        for index, path in enumerate(self.paths):
+            data = None
+            try:
+                if path is not None and (self.wanted is None or self.wanted(path)):
+                    size = os.path.getsize(path)
+                    if size <= self.budget_bytes:
+                        with self._cond:
+                            # Wait for room in the budget (an empty buffer always has room)
+                            self._cond.wait_for(lambda: self._closed or self._buffered == 0
+                                                or self._buffered + size <= self.budget_bytes)
+                            if self._closed:
+                                return
+                            self._buffered += size
+                        data = read_session_bytes(path)
+                        if len(data) != size:
+                            with self._cond:
+                                self._buffered += len(data) - size
+            except OSError:
+                data = None     # the consumer reads it again and reports the error
+            with self._cond:
+                if self._closed:
+                    return
+                self._ready[index] = data
+                self._cond.notify_all()
+
+    def get(self, index: int) -> bytes | None:
+        """Bytes of ``paths[index]``, or None if it was not read ahead."""
+        with self._cond:
+            self._cond.wait_for(lambda: index in self._ready or not self._thread.is_alive())
+            data = self._ready.pop(index, None)
+            if data is not None:
+                self._buffered -= len(data)
+                self._cond.notify_all()
+        return data
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._ready.clear()
+            self._cond.notify_all()
+        self._thread.join()
@@ -0,0 +1,75 @@
+"""
+Stage Timings
+=============
+Per-file timing of the extraction stages, so a slow batch shows where its
+time goes:
+
+    header     reading the CSV and its header lines
+    parse      decoding the event rows (or loading them from the parse cache)
+    extract    trial segmentation
+    write      per-session output files
+    aggregate  reducing the trial table to the aggregated row
+
+The records end up in the 'timings' sheet of the aggregated workbook and in
+``<aggregated name>.timings.json`` next to it.
+
+Requirements:  pip install pandas
+"""
+
+import json
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from output_fingerprint import atomic_write
+
+
+STAGES = ['header', 'parse', 'extract', 'write', 'aggregate']
+
+
+class StageTimer:
+    """Wall time spent in each stage of one file."""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    def copy(self) -> 'StageTimer':
+        timer = StageTimer()
+        timer.seconds = dict(self.seconds)
+        return timer
+
+    def record(self, filename: str, status: str, events: int, trials: int) -> dict:
+        """Timing record of a file: row counts, seconds per stage and in total."""
+        record = {'filename': filename, 'status': status, 'events': events, 'trials': trials}
+        for name in STAGES:
+            record[f'{name}_s'] = self.seconds[name]
+        record['total_s'] = sum(self.seconds.values())
+        return record
+
+
+def timings_frame(records: list[dict]) -> pd.DataFrame:
+    """Timing records as the rows of the 'timings' sheet."""
+    columns = ['filename', 'status', 'events', 'trials'] + [f'{name}_s' for name in STAGES] + ['total_s']
+    return pd.DataFrame(records, columns=columns)
+
+
+def write_timings_json(path: str, records: list[dict], run: dict):
+    """Machine-readable copy of the timings: run totals plus one entry per file."""
+    totals = {f'{name}_s': sum(r[f'{name}_s'] for r in records) for name in STAGES}
+    totals['events'] = sum(r['events'] for r in records)
+    totals['files'] = len(records)
+
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'run': run, 'totals': totals, 'files': records}, f, indent=2)
+
+    atomic_write(path, write)
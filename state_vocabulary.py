@@ -0,0 +1,94 @@
+"""
+State Vocabulary
+================
+Batch-wide interning of the ``state`` and ``Cat`` names of session CSVs.
+
+Every distinct name (``MagEntry``, ``ITI2sec``, ``hole5``, ``Entry``,
+``Finish``...) gets a small integer code the first time any session of the
+batch uses it, and keeps it for the whole batch. Sessions are encoded from
+their categorical columns with one lookup per distinct name, so separator and
+marker matching become integer comparisons on compact arrays, and the same
+code means the same state in every session.
+
+Requirements:  pip install pandas numpy
+"""
+
+import numpy as np
+import pandas as pd
+
+
+CODE_DTYPE = np.int32
+MISSING = -1             # code of empty fields and of names never seen
+
+
+class Vocabulary:
+    """Name <-> integer code mapping, growing as new names are seen."""
+
+    def __init__(self, names=()):
+        self._codes = {}
+        self._names = []
+        for name in names:
+            self.add(name)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name) -> bool:
+        return name in self._codes
+
+    def add(self, name: str) -> int:
+        """Code of ``name``, assigning the next free one if it is new."""
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self._names)
+            self._names.append(name)
+        return code
+
+    def code(self, name: str) -> int:
+        """Code of ``name`` (MISSING if no session used it)."""
+        return self._codes.get(name, MISSING)
+
+    def name(self, code: int) -> str:
+        return self._names[code]
+
+    def names(self) -> list[str]:
+        """Every name seen so far, sorted (for dropdowns)."""
+        return sorted(self._names)
+
+    def encode(self, values) -> np.ndarray:
+        """Codes of a column of names; empty values become MISSING.
+
+        Categorical columns (as produced by session_parser) are encoded with a
+        single lookup per category.
+        """
+        categorical = pd.Categorical(values)
+        lookup = np.array([self.add(name) for name in categorical.categories] + [MISSING],
+                          dtype=CODE_DTYPE)
+        # Missing values have category code -1, i.e. the MISSING sentinel at the end
+        return lookup[categorical.codes]
+
+
+class BatchVocabulary:
+    """State and Cat vocabularies shared by every session of a batch."""
+
+    def __init__(self):
+        self.state = Vocabulary()
+        self.cat = Vocabulary()
+
+    def add_session(self, df: pd.DataFrame):
+        """Intern the state and Cat names of a session without encoding it."""
+        for name in pd.Categorical(df['state']).categories:
+            self.state.add(name)
+        for name in pd.Categorical(df['Cat']).categories:
+            self.cat.add(name)
+
+    def merge(self, other: 'BatchVocabulary'):
+        """Intern every state and Cat name of another batch vocabulary."""
+        for name in other.state.names():
+            self.state.add(name)
+        for name in other.cat.names():
+            self.cat.add(name)
+
+    def encode_session(self, df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+        """(state codes, Cat codes) of a session's event table."""
+        return self.state.encode(df['state']), self.cat.encode(df['Cat'])
@@ -0,0 +1,212 @@
+"""
+Trial Segmentation Engine
+=========================
+Vectorized trial extraction for behavior-system event tables.
+
+Every event row is assigned a trial id in one pass (cumulative count of
+separator hits), then the first occurrence and the number of occurrences of
+each marker/reward state per trial are found with a single grouped operation
+over the whole session.
+
+Trials holding an incomplete-trial Cat value ('Finish' by default) are found
+with one prefix count over the Cat column. States and Cat values are
+matched as integer codes from a BatchVocabulary
+(state_vocabulary.py), never as strings.
+
+Requirements:  pip install pandas numpy
+"""
+
+import numpy as np
+import pandas as pd
+
+from state_vocabulary import MISSING, BatchVocabulary
+
+
+# Cat value that marks a trial as incomplete in the standard protocols
+DEFAULT_INCOMPLETE_CAT = 'Finish'
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Helpers
+# ──────────────────────────────────────────────────────────────────────────────
+
+def event_times_ms(df: pd.DataFrame) -> np.ndarray:
+    """Absolute event time in milliseconds (S * 1000 + MS) for every row."""
+    if 'time_ms' in df.columns:
+        return df['time_ms'].to_numpy()
+    return df['S'].to_numpy() * 1000 + df['MS'].to_numpy()
+
+
+def trial_start_mask(state: np.ndarray, cat: np.ndarray,
+                     separator: int, cat_value: int | None) -> np.ndarray:
+    """Boolean mask of the rows that open a trial.
+
+    A row opens a trial when its state code equals the separator code and its
+    Cat code equals ``cat_value`` (None accepts any Cat, i.e. "Both").
+    """
+    mask = state == separator
+    if cat_value is not None:
+        mask &= cat == cat_value
+    return mask
+
+
+def trials_containing(values: np.ndarray, target: int,
+                      starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Whether each row range [start, end) holds at least one ``target`` value.
+
+    A prefix count of the matching rows answers every range in O(1).
+    """
+    counts = np.concatenate(([0], np.cumsum(values == target)))
+    return counts[ends] - counts[starts] > 0
+
+
+def first_occurrence_rows(trial_id: np.ndarray, state: np.ndarray,
+                          states: list[int], n_trials: int) -> np.ndarray:
+    """Row position of the first occurrence of each state code in each trial.
+
+    Returns an (n_trials, len(states)) array holding -1 where the state does
+    not occur in the trial.
+    """
+    return state_occurrences(trial_id, state, states, n_trials)[0]
+
+
+def state_occurrences(trial_id: np.ndarray, state: np.ndarray,
+                      states: list[int], n_trials: int) -> tuple[np.ndarray, np.ndarray]:
+    """First row and number of occurrences of each state code in each trial.
+
+    Returns two (n_trials, len(states)) arrays: the row position of the first
+    occurrence (-1 where the state does not occur) and the occurrence count.
+    """
+    first_rows = np.full((n_trials, len(states)), -1, dtype=np.int64)
+    counts = np.zeros((n_trials, len(states)), dtype=np.int64)
+    if not states or n_trials == 0:
+        return first_rows, counts
+
+    # Column of every state code in the result (-1: not wanted); codes are
+    # small, so this is a plain array lookup. MISSING indexes the last slot.
+    slot = np.full(max(max(states), int(state.max(initial=0))) + 2, -1, dtype=np.int64)
+    for k, code in enumerate(states):
+        if code != MISSING:
+            slot[code] = k
+    state_idx = slot[state]
+    rows = np.flatnonzero((state_idx >= 0) & (trial_id >= 0))
+    if len(rows) == 0:
+        return first_rows, counts
+
+    # One key per (trial, state) pair; an unbuffered minimum per key keeps its
+    # first row. No sort, so the cost does not grow with the number of wanted states
+    keys = trial_id[rows] * len(states) + state_idx[rows]
+    first = np.full(n_trials * len(states), len(state), dtype=np.int64)
+    np.minimum.at(first, keys, rows)
+    first_rows = np.where(first < len(state), first, -1).reshape(n_trials, len(states))
+    counts = np.bincount(keys, minlength=n_trials * len(states)).reshape(n_trials, len(states))
+    return first_rows, counts
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Segmentation
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _trial_bounds(state: np.ndarray, cat: np.ndarray, vocabulary: BatchVocabulary,
+                  separator: str, cat_value: str,
+                  incomplete_cat: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(starts, ends, complete) of the trials of an encoded session.
+
+    Names no session used code as MISSING, like empty fields: an unknown
+    separator or Cat value opens no trial, and an unknown incomplete Cat
+    excludes none, rather than matching the blank cells.
+    """
+    separator_code = vocabulary.state.code(separator)
+    cat_code = None if cat_value == "Both" else vocabulary.cat.code(cat_value)
+    if separator_code == MISSING or cat_code == MISSING:
+        starts = np.empty(0, dtype=np.int64)
+    else:
+        starts = np.flatnonzero(trial_start_mask(state, cat, separator_code, cat_code))
+    ends = np.append(starts[1:], len(state))
+    incomplete_code = vocabulary.cat.code(incomplete_cat) if incomplete_cat else MISSING
+    if incomplete_code != MISSING:
+        complete = ~trials_containing(cat, incomplete_code, starts, ends)
+    else:
+        complete = np.ones(len(starts), dtype=bool)
+    return starts, ends, complete
+
+
+def trial_bounds(df: pd.DataFrame, separator: str, cat_value: str,
+                 incomplete_cat: str = DEFAULT_INCOMPLETE_CAT,
+                 vocabulary: BatchVocabulary | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Row range [start, end) of every trial of a session, and whether it is complete.
+
+    A trial is incomplete when one of its rows has ``incomplete_cat`` as Cat
+    (an empty value keeps every trial).
+    """
+    if vocabulary is None:
+        vocabulary = BatchVocabulary()
+    state, cat = vocabulary.encode_session(df)
+    return _trial_bounds(state, cat, vocabulary, separator, cat_value, incomplete_cat)
+
+
+def segment_trials(df: pd.DataFrame, separator: str, cat_value: str,
+                   markers: list[tuple[str, str | None]],
+                   vocabulary: BatchVocabulary | None = None,
+                   incomplete_cat: str = DEFAULT_INCOMPLETE_CAT) -> pd.DataFrame:
+    """Build the per-trial table for one session.
+
+    ``markers`` is a list of ``(marker_state, reward_state)`` pairs, where
+    ``reward_state`` is None for markers without a reward. Each marker (and
+    reward) gets ``_present`` and ``_time_ms`` columns for its first
+    occurrence in the trial and ``_count`` for all of them. Trials that contain
+    a row with ``incomplete_cat`` as Cat are excluded as incomplete, but keep
+    their trial number. ``vocabulary`` is the batch vocabulary the session is
+    encoded with (a private one is used if None).
+    """
+    if vocabulary is None:
+        vocabulary = BatchVocabulary()
+    n_rows = len(df)
+    state, cat = vocabulary.encode_session(df)
+
+    starts, ends, keep = _trial_bounds(state, cat, vocabulary, separator, cat_value, incomplete_cat)
+    n_trials = len(starts)
+    if n_trials == 0 or not keep.any():
+        return pd.DataFrame()
+
+    # Trial id per row: rows before the first separator belong to no trial (-1)
+    is_start = np.zeros(n_rows, dtype=np.int64)
+    is_start[starts] = 1
+    trial_id = np.cumsum(is_start) - 1
+
+    times = event_times_ms(df)
+    start_times = times[starts]
+
+    wanted = []
+    for marker_state, reward_state in markers:
+        wanted.append(marker_state)
+        if reward_state:
+            wanted.append(reward_state)
+    wanted = list(dict.fromkeys(wanted))
+    wanted_codes = [vocabulary.state.code(s) for s in wanted]
+    first_rows, counts = state_occurrences(trial_id, state, wanted_codes, n_trials)
+    first_rows, counts = first_rows[keep], counts[keep]
+    column_of = {s: i for i, s in enumerate(wanted)}
+
+    kept_start_times = start_times[keep]
+    table = {
+        'trial_num': np.flatnonzero(keep) + 1,
+        'start_line': starts[keep],
+        'stop_line': ends[keep] - 1,
+        'trial_start_time_ms': kept_start_times,
+    }
+
+    def add_columns(prefix, target_state):
+        rows = first_rows[:, column_of[target_state]]
+        present = rows >= 0
+        relative = np.where(present, times[np.where(present, rows, 0)] - kept_start_times, 0)
+        table[f'{prefix}_present'] = present.astype(np.int64)
+        table[f'{prefix}_time_ms'] = relative
+        table[f'{prefix}_count'] = counts[:, column_of[target_state]]
+
+    for marker_state, reward_state in markers:
+        add_columns(marker_state, marker_state)
+        if reward_state:
+            add_columns(f'{marker_state}_reward_{reward_state}', reward_state)
+
+    return pd.DataFrame(table)
@@ -0,0 +1,189 @@
+"""
+Vocabulary Scan
+===============
+Quick scan of the state and Cat names used by every session of an
+experiment type, so the configuration dropdowns offer states that only show
+up in later sessions.
+
+Only the Cat and state columns of each CSV are decoded (SessionReader:
+memory-mapped, no other column is touched), the files are spread over a
+process pool, and the name counts of every file are cached in
+processed_data/vocabulary_scan.json:
+
+    {"version": 1,
+     "files": {"<source CSV path>": {"size": ..., "mtime_ns": ..., "hash": "...",
+                                     "state": {name: events}, "Cat": {name: events}}}}
+
+A file with the same fingerprint as its entry (size and mtime, or else
+content hash) is not read again.
+
+Requirements:  pip install pandas numpy
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from output_fingerprint import atomic_write
+from parse_cache import file_fingerprint
+from session_parser import SessionReader
+from state_vocabulary import BatchVocabulary
+
+
+SCAN_VERSION = 1
+SCAN_COLUMNS = ['Cat', 'state']
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Per-file scan
+# ──────────────────────────────────────────────────────────────────────────────
+
+def scan_session(csv_path: str) -> dict:
+    """Fingerprint and per-name event counts of the Cat and state columns of a session."""
+    with SessionReader(csv_path) as reader:
+        # Hashed from the mapping the columns are decoded from: the file is read once
+        fingerprint = file_fingerprint(csv_path, reader.buffer)
+        columns = reader.columns(SCAN_COLUMNS)
+    counts = {}
+    for name, values in columns.items():
+        value_counts = pd.Series(values).value_counts()
+        counts[name] = {str(k): int(v) for k, v in value_counts.items() if v > 0}
+    return {**fingerprint, **counts}
+
+
+class ScanCache:
+    """Per-file scan results, keyed by source path and checked by fingerprint."""
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self.files = {}
+        if path is None:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                content = json.load(f)
+            if content.get('version') == SCAN_VERSION:
+                self.files = content.get('files', {})
+        except (OSError, ValueError):
+            pass
+
+    def lookup(self, csv_path: str) -> dict | None:
+        """Cached scan of an unchanged file (else None)."""
+        entry = self.files.get(os.path.abspath(csv_path))
+        if entry is None:
+            return None
+        stat = os.stat(csv_path)
+        if entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry
+
+        # Touched or copied: only the content decides
+        fingerprint = file_fingerprint(csv_path)
+        if fingerprint['hash'] != entry['hash']:
+            return None
+        entry.update(fingerprint)
+        return entry
+
+    def update(self, csv_path: str, entry: dict):
+        self.files[os.path.abspath(csv_path)] = entry
+
+    def save(self):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        def write(tmp_path):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': SCAN_VERSION, 'files': self.files}, f)
+
+        atomic_write(self.path, write)
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Batch scan
+# ──────────────────────────────────────────────────────────────────────────────
+
+@dataclass
+class VocabularyScan:
+    """Union of the names used by a set of sessions, with occurrence counts."""
+    state_events: dict[str, int] = field(default_factory=dict)    # events per state
+    state_sessions: dict[str, int] = field(default_factory=dict)  # sessions using each state
+    cat_events: dict[str, int] = field(default_factory=dict)      # events per Cat
+    sessions: int = 0          # sessions scanned (cached or read)
+    read: int = 0              # sessions actually read
+    failed: dict[str, str] = field(default_factory=dict)          # path -> error
+
+    def add(self, entry: dict):
+        for name, count in entry['state'].items():
+            self.state_events[name] = self.state_events.get(name, 0) + count
+            self.state_sessions[name] = self.state_sessions.get(name, 0) + 1
+        for name, count in entry['Cat'].items():
+            self.cat_events[name] = self.cat_events.get(name, 0) + count
+        self.sessions += 1
+
+    def add_to(self, vocabulary: BatchVocabulary):
+        """Intern every scanned name into a batch vocabulary."""
+        for name in sorted(self.state_events):
+            vocabulary.state.add(name)
+        for name in sorted(self.cat_events):
+            vocabulary.cat.add(name)
+
+
+def scan_vocabulary(csv_paths: list[str], cache_path: str | None = None, workers: int = 1,
+                    progress=None, cancel=None) -> VocabularyScan:
+    """Scan the Cat/state names of every session in ``csv_paths``.
+
+    Results are cached at ``cache_path`` (if given). Files not in the cache
+    are read by ``workers`` processes; ``progress`` is called as
+    progress(index, total, path) as they complete. Setting ``cancel`` stops
+    the scan early; the result then covers the files scanned so far.
+    Unreadable files are listed in ``failed``.
+    """
+    csv_paths = list(dict.fromkeys(csv_paths))
+    cache = ScanCache(cache_path)
+    result = VocabularyScan()
+    todo = []
+    for csv_path in csv_paths:
+        entry = cache.lookup(csv_path)
+        if entry is None:
+            todo.append(csv_path)
+        else:
+            result.add(entry)
+
+    total = len(csv_paths)
+
+    def finish(csv_path, scan):
+        try:
+            entry = scan()
+        except Exception as e:
+            result.failed[csv_path] = str(e)
+            return
+        cache.update(csv_path, entry)
+        result.add(entry)
+        result.read += 1
+
+    try:
+        if workers > 1 and len(todo) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+                futures = {pool.submit(scan_session, csv_path): csv_path for csv_path in todo}
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    finish(futures[future], future.result)
+                    if progress is not None:
+                        progress(result.sessions + len(result.failed), total, futures[future])
+                    if cancel is not None and cancel.is_set():
+                        for pending in futures:
+                            pending.cancel()
+        else:
+            for csv_path in todo:
+                if cancel is not None and cancel.is_set():
+                    break
+                finish(csv_path, lambda: scan_session(csv_path))
+                if progress is not None:
+                    progress(result.sessions + len(result.failed), total, csv_path)
+    finally:
+        cache.save()
+    return result